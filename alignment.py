@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+
+
+class Alignment:
+    """
+    A class for aligning cropped, subsampled or time-shifted leaks with the party copies.
+    """
+
+    @staticmethod
+    def get_reference(candidates):
+        """
+        Computes the consensus trajectory of the candidate copies.
+
+        Fingerprinting changes a minority of the points of each copy, so the most common cell at each timestep
+        is a good stand-in for the source trajectory.
+
+        Args:
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+
+        Returns:
+            list: The most common cell (x, y) at each timestep.
+        """
+        reference = []
+        for points in zip(*[cand_trajectory for cand_trajectory, _ in candidates]):
+            cell_counts = Counter((x_cell, y_cell) for x_cell, y_cell, _ in points)
+            reference.append(cell_counts.most_common(1)[0][0])
+        return reference
+
+    @staticmethod
+    def find_offset(leak_trajectory, reference, gram_size=3, max_stride=1, max_occurrences=8):
+        """
+        Finds the offset and stride that map the leak onto the reference.
+
+        Leak index i is mapped to reference index offset + stride * i. Every window of `gram_size` consecutive
+        leak cells is looked up in a hash table of reference windows sampled with each stride, and every hit
+        votes for an (offset, stride) pair. Windows that occur more than `max_occurrences` times in the
+        reference (e.g. while stationary) are skipped, which keeps the search linear in the leak length.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (x, y, _).
+            reference (list): The reference cells (x, y), e.g. from `get_reference`.
+            gram_size (int, optional): The number of cells per hashed window. Defaults to 3.
+            max_stride (int, optional): The largest subsampling stride to consider. Defaults to 1.
+            max_occurrences (int, optional): The maximum number of reference positions of a voting window. Defaults to 8.
+
+        Returns:
+            tuple: The best (offset, stride), or None if no window of the leak occurs in the reference.
+        """
+        leak_cells = [(x_cell, y_cell) for x_cell, y_cell, _ in leak_trajectory]
+        leak_grams = [
+            (i, tuple(leak_cells[i : i + gram_size]))
+            for i in range(len(leak_cells) - gram_size + 1)
+        ]
+
+        votes = Counter()
+        for stride in range(1, max_stride + 1):
+            positions = defaultdict(list)
+            for j in range(len(reference) - (gram_size - 1) * stride):
+                positions[tuple(reference[j : j + gram_size * stride : stride])].append(j)
+
+            for i, gram in leak_grams:
+                gram_positions = positions.get(gram, [])
+                if len(gram_positions) > max_occurrences:
+                    continue
+                for j in gram_positions:
+                    votes[(j - stride * i, stride)] += 1
+
+        if not votes:
+            return None
+        return votes.most_common(1)[0][0]
+
+    @staticmethod
+    def align(leak_trajectory, candidates, offset, stride=1):
+        """
+        Cuts the leak and the candidate copies down to their aligned window.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (x, y, _).
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, fp_flag).
+            offset (int): The reference index of the first leak point.
+            stride (int, optional): The number of reference points per leak point. Defaults to 1.
+
+        Returns:
+            tuple: The aligned leak trajectory and the aligned candidates.
+        """
+        length = min(len(cand_trajectory) for cand_trajectory, _ in candidates)
+        leak_indexes = [
+            i for i in range(len(leak_trajectory)) if 0 <= offset + stride * i < length
+        ]
+        aligned_leak = [leak_trajectory[i] for i in leak_indexes]
+        aligned_candidates = [
+            (
+                [cand_trajectory[offset + stride * i] for i in leak_indexes],
+                [fp_flag[offset + stride * i] for i in leak_indexes],
+            )
+            for cand_trajectory, fp_flag in candidates
+        ]
+        return aligned_leak, aligned_candidates
@@ -1,6 +1,6 @@
 from sampling import Sampling
-import random
-from collections import defaultdict
+import numpy as np
+from scipy.special import xlogy
 from configuration import Configuration
 
 class Attack:
@@ -9,237 +9,229 @@ class Attack:
     """
 
     @staticmethod
-    def random_distortion_attack(leak_trajectory, ratio):
+    def random_distortion_attack(leak_trajectory, ratio, rng=None):
         """
         Applies random distortion to a given leak trajectory.
 
         Args:
             leak_trajectory (list): The original leak trajectory represented as a list of tuples (lat, lng, tt).
             ratio (float): The probability of applying distortion to each point in the trajectory.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
 
         Returns:
             list: The distorted leak trajectory.
         """
 
+        rng = np.random if rng is None else rng
         new_trajectory = []
         for lat, lng, tt in leak_trajectory:
-            if random.random() < ratio:
-                sampled_lat, sampled_lng = Sampling.sample_nearby_point((lat, lng), 1)
+            if rng.uniform() < ratio:
+                sampled_lat, sampled_lng = Sampling.sample_nearby_point((lat, lng), 1, rng=rng)
                 new_trajectory.append((sampled_lat, sampled_lng, tt))
             else:
                 new_trajectory.append((lat, lng, tt))
         return new_trajectory
 
     @staticmethod
-    def correlation_attack(leak_trajectory, tau, ratio, correlation, debug=False):
+    def correlation_attack(leak_trajectory, tau, ratio, correlation, debug=False, rng=None):
         """
         Applies correlation-based attack to a given leak trajectory.
 
+        The most likely successors and tau-filtered candidate sets come from the precomputed tables of the
+        correlation model, so the attack reduces to array lookups and one vectorized draw.
+
         Args:
             leak_trajectory (list): The original leak trajectory represented as a list of tuples (lat, lng, tt).
             tau (float): The correlation threshold.
             ratio (float): The probability of applying distortion to each point in the trajectory.
             correlation (Correlation): An instance of the Correlation class containing transition information.
             debug (bool): Flag indicating whether to enable debugging output (default: False).
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
 
         Returns:
             list: The attacked leak trajectory.
         """
+        rng = np.random if rng is None else rng
+        tables = correlation.get_argmax_tables(tau)
 
-        new_trajectory = []
+        cells = np.array([(lat, lng) for lat, lng, _ in leak_trajectory], dtype=np.int64)
+        assert ((0 <= cells) & (cells < Configuration.GRID_SIZE)).all(), "Cell outside grid size"
+        prev_cells, current_cells = cells[:-1], cells[1:]
+        prev_lats, prev_lngs = prev_cells[:, 0], prev_cells[:, 1]
 
-        first_lat, first_lng, first_time = leak_trajectory[0]
-        new_trajectory.append((first_lat, first_lng, first_time))
-        prev_lat, prev_lng = first_lat, first_lng
+        in_tau = correlation.is_tau_candidate(prev_cells, current_cells, tau)
+        flips = rng.uniform(size=len(current_cells)) < ratio
 
-        for i, ((lat, lng, _), (current_lat, current_lng, current_time)) in enumerate(
-            zip(leak_trajectory, leak_trajectory[1:])
-        ):
-            candidates, tau_candidates = correlation.get_all_transition(
-                (prev_lat, prev_lng), None, tau, False
-            )
-            sampled_lat, sampled_lng = current_lat, current_lng
-
-            if (current_lat, current_lng) not in tau_candidates.keys():
-                if random.random() < ratio:
-                    if len(candidates) > 0:
-                        if len(tau_candidates) > 0:
-                            sampled_lat, sampled_lng = max(
-                                tau_candidates.keys(), key=lambda x: tau_candidates[x]
-                            )
-
-                        else:
-                            sampled_lat, sampled_lng = max(
-                                candidates.keys(), key=lambda x: candidates[x]
-                            )
-
-                        if debug:
-                            print(
-                                i,
-                                "Not in, Flip",
-                                current_lat,
-                                current_lng,
-                                "->",
-                                sampled_lat,
-                                sampled_lng,
-                            )
-
-                    else:
-                        if debug:
-                            print("No candidate, pass")
-
-            elif random.random() < ratio:
-                sampled_lat, sampled_lng = Sampling.sample_nearby_point(
-                    (current_lat, current_lng), Configuration.SCALE
+        successors = np.where(
+            tables["tau_argmax"][prev_lats, prev_lngs] >= 0,
+            tables["tau_argmax"][prev_lats, prev_lngs],
+            tables["argmax"][prev_lats, prev_lngs],
+        )
+        sampled_cells = current_cells.copy()
+        sampled_cells[~in_tau & flips] = successors[~in_tau & flips]
+        sampled_cells[in_tau & flips] = Sampling.sample_nearby_points(
+            current_cells[in_tau & flips], Configuration.SCALE, rng=rng
+        )
+
+        if debug:
+            for i in np.flatnonzero(flips):
+                print(
+                    i,
+                    "in, Flip" if in_tau[i] else "Not in, Flip",
+                    *current_cells[i],
+                    "->",
+                    *sampled_cells[i],
                 )
-                if debug:
-                    print(
-                        i,
-                        "in, Flip",
-                        current_lat,
-                        current_lng,
-                        "->",
-                        sampled_lat,
-                        sampled_lng,
-                    )
 
+        new_trajectory = [tuple(leak_trajectory[0])]
+        for (sampled_lat, sampled_lng), (_, _, current_time) in zip(
+            sampled_cells.tolist(), leak_trajectory[1:]
+        ):
             new_trajectory.append((sampled_lat, sampled_lng, current_time))
-
-            prev_lat, prev_lng = current_lat, current_lng
-
         return new_trajectory
 
     @staticmethod
-    def majority_collusion_attack(colluding_trajectories):
+    def majority_collusion_attack(colluding_trajectories, rng=None):
         """
         Performs a majority collusion attack on a set of colluding trajectories.
 
+        The colluders' cells are encoded as flat ids over a (colluders, length) matrix, the per-timestep
+        modes are found by sorting (timestep, cell) keys, and ties are broken with one vectorized draw.
+
         Args:
-            colluding_trajectories (list): The set of colluding trajectories represented as a list of lists of tuples (lat, lng, tt).
+            colluding_trajectories (list or numpy.ndarray): The set of colluding trajectories represented as a list of lists of tuples (lat, lng, tt),
+                or an array of shape (colluders, length, 3).
+            rng (RandomState, optional): The random generator for breaking ties. Defaults to the global numpy generator.
 
         Returns:
             list: The attacked leak trajectory.
         """
-
-        leak_trajectory = []
-
-        for i in range(len(colluding_trajectories[0])):
-            count_dict = defaultdict(lambda: 0)
-
-            for colluding_trajectory in colluding_trajectories:
-                cell_lat, cell_lng, true_time = colluding_trajectory[i]
-                count_dict[(cell_lat, cell_lng)] += 1
-
-            max_ct = max(count_dict.values())
-            max_candidates = []
-
-            for key, ct in count_dict.items():
-                if max_ct == ct:
-                    max_candidates.append(key)
-
-            max_key = max_candidates[random.choice(range(len(max_candidates)))]
-            leak_trajectory.append((max_key[0], max_key[1], true_time))
-
-        return leak_trajectory
+        rng = np.random if rng is None else rng
+
+        cells = np.asarray(colluding_trajectories)[:, :, :2].astype(np.int64)
+        length = cells.shape[1]
+        min_cell = cells.min(axis=(0, 1))
+        cells = cells - min_cell
+        width = cells[:, :, 1].max() + 1
+        cell_ids = cells[:, :, 0] * width + cells[:, :, 1]
+        cell_count = int(cell_ids.max()) + 1
+
+        keys = np.arange(length) * cell_count + cell_ids
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        columns = unique_keys // cell_count
+        starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+
+        max_counts = np.maximum.reduceat(counts, starts)
+        tie_draws = np.where(counts == max_counts[columns], rng.uniform(size=len(counts)), -1)
+        order = np.lexsort((tie_draws, columns))
+        chosen = order[np.r_[starts[1:], len(counts)] - 1]
+        max_ids = unique_keys[chosen] % cell_count
+        max_lats = (max_ids // width + min_cell[0]).tolist()
+        max_lngs = (max_ids % width + min_cell[1]).tolist()
+
+        times = [point[2] for point in colluding_trajectories[-1]]
+        return list(zip(max_lats, max_lngs, times))
 
     @staticmethod
     def probabilistic_collusion_attack(
-        colluding_trajectories, p_estimate, tau, correlation, attack_ratio, debug=False
+        colluding_trajectories, p_estimate, tau, correlation, attack_ratio, debug=False, rng=None
     ):
         """
         Performs a probabilistic collusion attack on a set of colluding trajectories.
 
+        Candidate cells are scored in the log domain, log(tran_prob) + count * log(1 - p) + (leaked_count - count) * log(p),
+        for all candidates of a timestep at once, so the scores do not underflow for large collusion counts.
+        Transitions come from the cached structures of the correlation model.
+
         Args:
-            colluding_trajectories (list): The set of colluding trajectories represented as a list of lists of tuples (lat, lng, tt).
+            colluding_trajectories (list or numpy.ndarray): The set of colluding trajectories represented as a list of lists of tuples (lat, lng, tt),
+                or an array of shape (colluders, length, 3).
             p_estimate (float): The probability estimate for the first coordinate in the attack.
             tau (float): The correlation threshold.
             correlation (Correlation): An instance of the Correlation class containing transition information.
             attack_ratio (float): The probability of applying distortion to each point in the trajectory.
             debug (bool): Flag indicating whether to enable debugging output (default: False).
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
 
         Returns:
             list: The attacked leak trajectory.
         """
+        rng = np.random if rng is None else rng
+        tables = correlation.get_argmax_tables(tau)
+
+        cells = np.asarray(colluding_trajectories)[:, :, :2].astype(np.int64)
+        leaked_count, length = cells.shape[:2]
+        times = [point[2] for point in colluding_trajectories[-1]]
+
+        # Group the colluders' cells by timestep: unique (timestep, cell) keys with counts and first colluder
+        min_cell = cells.min(axis=(0, 1))
+        cells = cells - min_cell
+        width = cells[:, :, 1].max() + 1
+        cell_ids = cells[:, :, 0] * width + cells[:, :, 1]
+        cell_count = int(cell_ids.max()) + 1
+        keys = (np.arange(length) * cell_count + cell_ids).ravel()
+        unique_keys, first_indexes, counts = np.unique(keys, return_index=True, return_counts=True)
+        columns = unique_keys // cell_count
+        candidate_cells = np.stack(
+            [(unique_keys % cell_count) // width, (unique_keys % cell_count) % width], axis=1
+        ) + min_cell
+        bounds = np.r_[np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]]), len(unique_keys)]
+
+        # Majority pick per timestep, ties going to the cell seen first among the colluders
+        order = np.lexsort((first_indexes // length, -counts, columns))
+        majority_cells = candidate_cells[order[bounds[:-1]]]
+
+        count_log_scores = xlogy(np.arange(leaked_count + 1), 1 - p_estimate) + xlogy(
+            leaked_count - np.arange(leaked_count + 1), p_estimate
+        )
 
-        leaked_count = len(colluding_trajectories)
-        leak_trajectory = []
+        def sample_log_scores(cand_cells, log_scores):
+            if np.isneginf(log_scores).all():
+                return tuple(cand_cells[rng.randint(len(cand_cells))])
+            probs = np.exp(log_scores - log_scores.max())
+            return tuple(cand_cells[rng.choice(len(cand_cells), p=probs / probs.sum())])
 
         # Process the first entry
-        count_dict = defaultdict(lambda: 0)
-        for colluding_trajectory in colluding_trajectories:
-            cell_lat, cell_lng, true_time = colluding_trajectory[0]
-            count_dict[(cell_lat, cell_lng)] += 1
-
-        for key, count in count_dict.items():
-            count_dict[key] = (1 - p_estimate) ** count * p_estimate ** (
-                leaked_count - count
-            )
-
-        (cell_lat, cell_lng), _ = Sampling.sample_proportionally_with_truth(
-            count_dict, None, None
-        )
-        leak_trajectory.append((cell_lat, cell_lng, true_time))
+        start, end = bounds[0], bounds[1]
+        cell_lat, cell_lng = sample_log_scores(candidate_cells[start:end], count_log_scores[counts[start:end]])
+        leak_trajectory = [(int(cell_lat), int(cell_lng), times[0])]
 
         # Process the rest
-        for i in range(len(colluding_trajectories[0])):
-            if i == 0:
-                continue
-
+        attack_flags = rng.uniform(size=length) < attack_ratio
+        for i in range(1, length):
             if debug:
                 print(i, leak_trajectory[-1])
 
-            prev_lat, prev_lng, prev_time = leak_trajectory[-1]
-            count_dict = defaultdict(lambda: 0)
-            for colluding_trajectory in colluding_trajectories:
-                cell_lat, cell_lng, time = colluding_trajectory[i]
-                count_dict[(cell_lat, cell_lng)] += 1
+            start, end = bounds[i], bounds[i + 1]
             if debug:
-                print("Count:", count_dict)
-
-            if random.random() < attack_ratio:
-                roll_dict = {}
-                for key, count in count_dict.items():
-                    transition = correlation.get_transition((prev_lat, prev_lng))
-                    if key in transition.keys() and transition[key] > tau:
-                        tran_prob = transition[key]
-                    else:
-                        tran_prob = 0
-
-                    if tran_prob > 0:
-                        roll_dict[key] = (
-                            tran_prob
-                            * (1 - p_estimate) ** count
-                            * p_estimate ** (leaked_count - count)
-                        )
+                print("Count:", dict(zip(map(tuple, candidate_cells[start:end].tolist()), counts[start:end])))
 
-                if debug:
-                    print(roll_dict)
+            if attack_flags[i]:
+                prev_lat, prev_lng, _ = leak_trajectory[-1]
+                transition = correlation.get_cached_transition((prev_lat, prev_lng))
+                tran_probs = np.array(
+                    [transition.get(cell, 0) for cell in map(tuple, candidate_cells[start:end].tolist())]
+                )
+                valid = tran_probs > tau
 
-                if len(roll_dict) > 0:
+                if valid.any():
                     if debug:
                         print("Sample among truths")
-                    (cell_lat, cell_lat), _ = Sampling.sample_proportionally_with_truth(
-                        roll_dict, None, None
+                    cell_lat, cell_lng = sample_log_scores(
+                        candidate_cells[start:end][valid],
+                        np.log(tran_probs[valid]) + count_log_scores[counts[start:end][valid]],
                     )
-
                 else:
                     if debug:
                         print("Pick MAX Prob")
-                    transition = correlation.get_transition((prev_lat, prev_lng))
-                    cell_lat, cell_lng = sorted(
-                        transition.keys(), key=lambda x: -transition[x]
-                    )[0]
-
+                    cell_lat, cell_lng = tables["argmax"][prev_lat, prev_lng]
             else:
                 if debug:
                     print("Pick as MJR")
-                cell_lat, cell_lng = sorted(
-                    count_dict.keys(), key=lambda x: -count_dict[x]
-                )[0]
+                cell_lat, cell_lng = majority_cells[i]
 
             if debug:
                 print("Report:", cell_lat, cell_lng)
-            leak_trajectory.append((cell_lat, cell_lng, true_time))
+            leak_trajectory.append((int(cell_lat), int(cell_lng), times[i]))
 
         return leak_trajectory
-
@@ -52,3 +52,12 @@ class Configuration:
 
     EVAL_GRID_SIZE = 10
     # Grid size for utility evaluation.
+
+    DATASET_CACHE_SIZE = 16
+    # Number of memory-mapped trajectory stores, and of split files read, kept open by the data loader.
+
+    EXTRACTION_CHUNK_SIZE = 10000
+    # Number of raw rows (or files) read per chunk by the streaming extractor.
+
+    EXTRACTION_MEMORY_LIMIT = 512 * 1024 ** 2
+    # Bytes of extracted points buffered before they are written to the trajectory store.
@@ -1,3 +1,4 @@
+import numpy as np
 from configuration import Configuration
 
 
@@ -63,6 +64,30 @@ class Coordinates:
         
         return x, y
 
+    @staticmethod
+    def get_cells(points, grid_size=None):
+        """
+        Converts an array of geographical points to their grid cells, as `get_cell` does for a single point.
+
+        Args:
+            points (numpy.ndarray): The points as an array of shape (n, 2) of (latitude, longitude).
+            grid_size (int): The size of the grid (optional).
+
+        Returns:
+            numpy.ndarray: The grid cells as an int64 array of shape (n, 2).
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        gps_limits = Configuration.GPS_LIMIT
+        lows = np.array([gps_limits["lat"][0], gps_limits["lng"][0]])
+        highs = np.array([gps_limits["lat"][1], gps_limits["lng"][1]])
+        assert np.all((lows <= points) & (points < highs)), "Point outside GPS limits"
+
+        if grid_size is None:
+            grid_size = Configuration.GRID_SIZE
+
+        steps = (highs - lows) / grid_size
+        return ((points - lows) / steps).astype(np.int64)
+
     @staticmethod
     def get_coordinate(cell):
         """
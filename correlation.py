@@ -1,4 +1,6 @@
+import numpy as np
 from collections import defaultdict
+from functools import partial
 from configuration import Configuration
 from coordinates import Coordinates
 from distance import Distance
@@ -17,6 +19,8 @@ class Correlation:
             prior_knowledge (list): Prior knowledge of cell trajectories.
         """
         self.emission, self.transition = self.generate_correlation_model(prior_knowledge)
+        self._transition_cache = {}
+        self._argmax_tables = {}
 
     def generate_correlation_model(self, prior):
         """
@@ -29,7 +33,7 @@ class Correlation:
             tuple: Emission and transition dictionaries.
         """
         emission = defaultdict(int)
-        transition = defaultdict(lambda: defaultdict(int))
+        transition = defaultdict(partial(defaultdict, int))
 
         for cell_trajectory in prior:
             for prev_point, curr_point in zip(cell_trajectory, cell_trajectory[1:]):
@@ -126,3 +130,113 @@ class Correlation:
             return candidates, tau_candidates, tau_dist_candidates
         else:
             return candidates, tau_candidates
+
+    def get_cached_transition(self, prior):
+        """
+        Retrieve the transition probabilities from the prior cell, computing them only once per cell.
+
+        Args:
+            prior (tuple): The prior cell as a tuple (x, y).
+
+        Returns:
+            dict: The transition probabilities to neighboring cells, as returned by `get_transition`.
+        """
+        if prior not in self._transition_cache:
+            self._transition_cache[prior] = self.get_transition(prior)
+        return self._transition_cache[prior]
+
+    def get_argmax_tables(self, tau):
+        """
+        Precompute the most likely successor of every grid cell and the tau-filtered candidate sets.
+
+        Cells without observed transitions move uniformly to their in-range neighborhood, so their tables are
+        computed with array arithmetic; only cells with observed transitions are visited one by one. The
+        tables are cached per tau.
+
+        Args:
+            tau (float): The correlation threshold.
+
+        Returns:
+            dict: The tables, with keys
+                "argmax": (GRID_SIZE, GRID_SIZE, 2) array of the most likely successor of each cell,
+                "tau_argmax": the same restricted to successors with probability >= tau, or -1 if there is none,
+                "observed": boolean array marking the cells with observed transitions,
+                "neighbor_tau": boolean array marking the unobserved cells whose neighborhood passes tau,
+                "tau_pairs": sorted flat (cell, successor) ids of the tau-filtered successors of observed cells.
+        """
+        if tau in self._argmax_tables:
+            return self._argmax_tables[tau]
+
+        grid_size = Configuration.GRID_SIZE
+        neighbor_range = Configuration.NEIGHBOR_RANGE
+        x_cells, y_cells = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing="ij")
+
+        neighbor_counts = (
+            (np.minimum(x_cells + neighbor_range, grid_size - 1) - np.maximum(x_cells - neighbor_range, 0) + 1)
+            * (np.minimum(y_cells + neighbor_range, grid_size - 1) - np.maximum(y_cells - neighbor_range, 0) + 1)
+        )
+        neighbor_tau = 1 / neighbor_counts >= tau
+        argmax = np.stack(
+            [np.maximum(x_cells - neighbor_range, 0), np.maximum(y_cells - neighbor_range, 0)], axis=-1
+        )
+        tau_argmax = np.where(neighbor_tau[:, :, None], argmax, -1)
+
+        observed = np.zeros((grid_size, grid_size), dtype=bool)
+        tau_pairs = []
+        for cell, successors in list(self.transition.items()):
+            if not successors or not Coordinates.in_range_cell(cell):
+                continue
+            candidates = self.get_cached_transition(cell)
+            tau_candidates = [key for key, value in candidates.items() if value >= tau]
+
+            observed[cell] = True
+            argmax[cell] = max(candidates.keys(), key=lambda x: candidates[x])
+            if tau_candidates:
+                tau_argmax[cell] = max(tau_candidates, key=lambda x: candidates[x])
+            else:
+                tau_argmax[cell] = -1
+
+            cell_id = cell[0] * grid_size + cell[1]
+            tau_pairs += [
+                cell_id * grid_size * grid_size + x_cell * grid_size + y_cell for x_cell, y_cell in tau_candidates
+            ]
+
+        self._argmax_tables[tau] = {
+            "argmax": argmax,
+            "tau_argmax": tau_argmax,
+            "observed": observed,
+            "neighbor_tau": neighbor_tau,
+            "tau_pairs": np.unique(np.array(tau_pairs, dtype=np.int64)),
+        }
+        return self._argmax_tables[tau]
+
+    def is_tau_candidate(self, prev_cells, cells, tau):
+        """
+        Check for each step whether the cell is among the tau-filtered transition candidates of the previous cell.
+
+        Args:
+            prev_cells (numpy.ndarray): The previous cells as an integer array of shape (steps, 2).
+            cells (numpy.ndarray): The current cells as an integer array of shape (steps, 2).
+            tau (float): The correlation threshold.
+
+        Returns:
+            numpy.ndarray: Boolean array with one entry per step.
+        """
+        tables = self.get_argmax_tables(tau)
+        grid_size = Configuration.GRID_SIZE
+        neighbor_range = Configuration.NEIGHBOR_RANGE
+        prev_x, prev_y = prev_cells[:, 0], prev_cells[:, 1]
+        x_cells, y_cells = cells[:, 0], cells[:, 1]
+
+        in_range = (0 <= x_cells) & (x_cells < grid_size) & (0 <= y_cells) & (y_cells < grid_size)
+        in_neighborhood = (
+            in_range & (np.abs(x_cells - prev_x) <= neighbor_range) & (np.abs(y_cells - prev_y) <= neighbor_range)
+        )
+        pair_ids = (prev_x * grid_size + prev_y) * grid_size * grid_size + x_cells * grid_size + y_cells
+        in_tau_pairs = in_range & np.isin(pair_ids, tables["tau_pairs"])
+
+        return np.where(
+            tables["observed"][prev_x, prev_y],
+            in_tau_pairs,
+            tables["neighbor_tau"][prev_x, prev_y] & in_neighborhood,
+        )
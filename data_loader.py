@@ -1,6 +1,9 @@
 import json
+from functools import lru_cache
 from pathlib import Path
 from configuration import Configuration
+from trajectory_store import TrajectoryStore
+from trajectory_subset import TrajectorySubset
 
 
 class DataLoader:
@@ -9,7 +12,7 @@ class DataLoader:
     """
 
     @staticmethod
-    def load_dp_data(dataset, epsilon, method="pim", index=0):
+    def load_dp_data(dataset, epsilon, method="pim", index=0, lazy=False):
         """
         Loads differential privacy data for a specific dataset.
 
@@ -18,67 +21,198 @@ class DataLoader:
             epsilon (float): The privacy parameter epsilon.
             method (str): The differential privacy method (default: "pim").
             index (int): The index of the data file (default: 0).
+            lazy (bool): Whether to return a memory-mapped handle instead of loading the data (default: False).
 
         Returns:
-            dict: The loaded differential privacy data.
+            list or TrajectoryStore: The loaded differential privacy data.
         """
         print("Loading dp data...")
         Configuration.GPS_LIMIT = Configuration.GPS_LIMITS[dataset.value]
         data_path = Path(Configuration.DP_DATA_PATH.format(dataset.value, method),
                          "{}_{:.3f}_{}.dat".format(dataset.value, epsilon, index))
-        with data_path.open("r") as f:
-            return json.load(f)
+        return DataLoader.load_trajectories(data_path, lazy=lazy)
 
     @staticmethod
-    def load_correlation_data(dataset, index):
+    def load_correlation_data(dataset, index, lazy=False):
         """
         Loads correlation data for a specific dataset.
 
         Args:
             dataset (Enum): The dataset to load the data for.
             index (int): The index of the data file.
+            lazy (bool): Whether to return a memory-mapped handle instead of loading the data (default: False).
 
         Returns:
-            dict: The loaded correlation data.
+            list, TrajectoryStore or TrajectorySubset: The loaded correlation data.
         """
         print("Loading correlation data...")
         Configuration.GPS_LIMIT = Configuration.GPS_LIMITS[dataset.value]
         data_path = Path(Configuration.CLEANSED_DATA_PATH.format(dataset.value),
                          "correlation_trajectories_{}.dat".format(index))
-        with data_path.open("r") as f:
-            return json.load(f)
+        return DataLoader.load_trajectories(data_path, lazy=lazy)
 
     @staticmethod
-    def load_experimental_data(dataset, index):
+    def load_experimental_data(dataset, index, lazy=False):
         """
         Loads experimental data for a specific dataset.
 
         Args:
             dataset (Enum): The dataset to load the data for.
             index (int): The index of the data file.
+            lazy (bool): Whether to return a memory-mapped handle instead of loading the data (default: False).
 
         Returns:
-            dict: The loaded experimental data.
+            list, TrajectoryStore or TrajectorySubset: The loaded experimental data.
         """
         Configuration.GPS_LIMIT = Configuration.GPS_LIMITS[dataset.value]
         data_path = Path(Configuration.CLEANSED_DATA_PATH.format(dataset.value),
                          "exp_trajectories_{}.dat".format(index))
-        with data_path.open("r") as f:
-            return json.load(f)
+        return DataLoader.load_trajectories(data_path, lazy=lazy)
 
     @staticmethod
-    def load_extracted_data(dataset):
+    def load_extracted_data(dataset, lazy=False):
         """
         Loads extracted data for a specific dataset.
 
         Args:
             dataset (Enum): The dataset to load the data for.
+            lazy (bool): Whether to return a memory-mapped handle instead of loading the data (default: False).
 
         Returns:
-            dict: The loaded extracted data.
+            list or TrajectoryStore: The loaded extracted data.
         """
         Configuration.GPS_LIMIT = Configuration.GPS_LIMITS[dataset.value]
         data_path = Path(Configuration.EXTRACTED_DATA_PATH.format(dataset.value),
                          "extracted_trajectories.dat")
+        return DataLoader.load_trajectories(data_path, lazy=lazy)
+
+    @staticmethod
+    def load_trajectories(data_path, lazy=False):
+        """
+        Loads a trajectory file, preferring its memory-mapped columnar store or split file when one is up to date.
+
+        The most recent of the JSON file, its store and its split file is loaded, so rewriting the JSON file (e.g. by
+        extracting the data again) takes effect even if an older store or split is left next to it. A split is only
+        used while its base data is not newer than the split itself. Stores and splits are read-only handles that
+        are cached by path and modification time, so repeated loads of them are free; JSON data is parsed on every
+        call, so callers may modify it.
+
+        Args:
+            data_path (Path): The path of the JSON trajectory file.
+            lazy (bool): Whether to convert the JSON file to a store if it has no up-to-date store yet (default: False).
+
+        Returns:
+            list, TrajectoryStore or TrajectorySubset: The store or split of `data_path` if any, the parsed JSON data otherwise.
+        """
+        store_path = TrajectoryStore.get_store_path(data_path)
+        split_path = TrajectorySubset.get_split_path(data_path)
+        json_time = DataLoader.get_modified_time(data_path)
+        store_time = DataLoader.get_modified_time(Path(store_path, TrajectoryStore.OFFSETS_FILE))
+        split_time = DataLoader.get_modified_time(split_path)
+
+        if split_time is not None:
+            _, base_path = DataLoader.read_split(str(split_path.resolve()), split_time)
+            base_times = [
+                DataLoader.get_modified_time(base_path.with_suffix(".dat")),
+                DataLoader.get_modified_time(Path(base_path, TrajectoryStore.OFFSETS_FILE)),
+            ]
+            is_split_current = all(base_time is None or base_time <= split_time for base_time in base_times)
+            if is_split_current and all(time is None or time <= split_time for time in (json_time, store_time)):
+                return DataLoader.open_split(str(split_path.resolve()), split_time)
+
+        if lazy and json_time is not None and (store_time is None or store_time < json_time):
+            TrajectoryStore.from_json(data_path, store_path)
+            store_time = DataLoader.get_modified_time(Path(store_path, TrajectoryStore.OFFSETS_FILE))
+        if store_time is not None and (json_time is None or store_time >= json_time):
+            return DataLoader.open_store(str(store_path.resolve()), store_time)
         with data_path.open("r") as f:
             return json.load(f)
+
+    @staticmethod
+    def get_modified_time(path):
+        """
+        Returns the modification time of a file.
+
+        Args:
+            path (Path): The path of the file.
+
+        Returns:
+            int: The modification time in nanoseconds, or None if the file does not exist.
+        """
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    @lru_cache(maxsize=Configuration.DATASET_CACHE_SIZE)
+    def open_store(store_path, modified_time):
+        """
+        Opens a trajectory store, reusing the handle of recent calls.
+
+        The handle maps the store files read-only, so caching it pins no data in memory: the operating system
+        pages the mapped files in and out as they are read.
+
+        Args:
+            store_path (str): The resolved store directory.
+            modified_time (int): The modification time of the store, so that regenerated stores are reopened.
+
+        Returns:
+            TrajectoryStore: The memory-mapped store.
+        """
+        return TrajectoryStore.load(store_path)
+
+    @staticmethod
+    @lru_cache(maxsize=Configuration.DATASET_CACHE_SIZE)
+    def open_split(split_path, modified_time):
+        """
+        Opens a split file over its base store, reusing the subset of recent calls.
+
+        Args:
+            split_path (str): The resolved split file.
+            modified_time (int): The modification time of the split file, so that regenerated splits are reopened.
+
+        Returns:
+            TrajectorySubset: The trajectories of the split.
+        """
+        indexes, base_path = DataLoader.read_split(split_path, modified_time)
+        return TrajectorySubset(DataLoader.load_trajectories(base_path.with_suffix(".dat")), indexes)
+
+    @staticmethod
+    @lru_cache(maxsize=Configuration.DATASET_CACHE_SIZE)
+    def read_split(split_path, modified_time):
+        """
+        Reads a split file, reusing the result of recent calls so that checking its base store is free.
+
+        Args:
+            split_path (str): The resolved split file.
+            modified_time (int): The modification time of the split file, so that regenerated splits are read again.
+
+        Returns:
+            tuple: The read-only indexes of the selected trajectories and the path of the base store.
+        """
+        return TrajectorySubset.read(split_path)
+
+    @staticmethod
+    def convert_to_store(dataset, method="pim"):
+        """
+        Converts all JSON trajectory files of a dataset to columnar stores, which are then loaded instead.
+
+        Args:
+            dataset (Enum): The dataset whose files to convert.
+            method (str): The differential privacy method of the dp data (default: "pim").
+
+        Returns:
+            list: The paths of the converted files.
+        """
+        data_paths = [
+            Path(Configuration.EXTRACTED_DATA_PATH.format(dataset.value)),
+            Path(Configuration.CLEANSED_DATA_PATH.format(dataset.value)),
+            Path(Configuration.DP_DATA_PATH.format(dataset.value, method)),
+        ]
+        converted = []
+        for data_path in data_paths:
+            for json_path in sorted(data_path.glob("*.dat")):
+                TrajectoryStore.from_json(json_path)
+                converted.append(json_path)
+        return converted
@@ -4,4 +4,8 @@ from enum import Enum
 class Dataset(Enum):
     
     urbanmob = "urbanmob"
+    GEO_LIFE = "geo_life"
+    TAXI = "taxi"
+    OLDENBURG = "oldenburg"
+    SAN_JOAQUIN = "san_joaquin"
   
@@ -3,6 +3,8 @@ from configuration import *
 from dataset import *
 from data_loader import *
 from trajectory_util import *
+from trajectory_store_writer import *
+from trajectory_subset import *
 
 
 class DatasetUtil:
@@ -10,6 +12,9 @@ class DatasetUtil:
     A utility class for dataset operations.
     """
 
+    EXTRACTABLE_DATASETS = (Dataset.GEO_LIFE, Dataset.TAXI, Dataset.OLDENBURG, Dataset.SAN_JOAQUIN)
+    # Datasets whose raw format the extractors can parse.
+
     @staticmethod
     def extract_dataset(dataset):
         """
@@ -17,7 +22,13 @@ class DatasetUtil:
 
         Args:
             dataset (Enum): The dataset to extract trajectories from.
+
+        Raises:
+            RuntimeError: If the raw format of the dataset is not supported.
         """
+        if dataset not in DatasetUtil.EXTRACTABLE_DATASETS:
+            raise RuntimeError("Unsupported dataset for extraction: {}.".format(dataset.value))
+
         print("Extracting trajectories from raw data...")
         data_path = Configuration.RAW_DATA_PATH.format(dataset.value)
         out_path = Configuration.EXTRACTED_DATA_PATH.format(dataset.value)
@@ -63,8 +74,7 @@ class DatasetUtil:
             file_name = Path(
                 Configuration.RAW_DATA_PATH.format(dataset.value), "data.csv"
             )
-            file_path =r'C:\Users\saite\Downloads\pro\Robust-Fingerprint-of-Location-Trajectories-Under-Differential-Privacy\data\taxi\raw\data.csv'
-            data = pd.read_csv(file_path)["POLYLINE"].to_list()
+            data = pd.read_csv(file_name)["POLYLINE"].to_list()
 
             def add_timestamp(trajectory):
                 out_trajectory = []
@@ -111,6 +121,199 @@ class DatasetUtil:
                 json.dump(trajectories, f)
         print("Extraction OK.")
 
+    @staticmethod
+    def stream_extract_dataset(
+        dataset,
+        chunk_size=Configuration.EXTRACTION_CHUNK_SIZE,
+        memory_limit=Configuration.EXTRACTION_MEMORY_LIMIT,
+        n_jobs=16,
+    ):
+        """
+        Extracts trajectories from raw data into a trajectory store, reading the input in bounded chunks.
+
+        Half of `memory_limit` is the write buffer of the store and half the budget of a chunk of input: GeoLife
+        chunks are sized by the file sizes, which exceed their parsed size, and taxi chunks by the parsed size per
+        row of the previous chunks. Each chunk is split into one batch per worker, parsed into compact arrays and
+        appended to the store in input order. A single trajectory larger than the budget is still read whole.
+        Oldenburg and San Joaquin trajectories interleave, so their file is read twice: once to count the points of
+        each trajectory and once to write every point at its final position, which keeps the order of
+        `extract_dataset` while holding only per-trajectory counters.
+
+        Args:
+            dataset (Enum): The dataset to extract trajectories from.
+            chunk_size (int): The maximum number of raw rows (taxi) or files (GeoLife) per chunk.
+            memory_limit (int): The number of bytes of input and parsed points held in memory.
+            n_jobs (int): The number of parallel workers (default: 16).
+
+        Returns:
+            TrajectoryStore: The memory-mapped extracted trajectories.
+
+        Raises:
+            RuntimeError: If the raw format of the dataset is not supported.
+        """
+        if dataset not in DatasetUtil.EXTRACTABLE_DATASETS:
+            raise RuntimeError("Unsupported dataset for extraction: {}.".format(dataset.value))
+
+        print("Extracting trajectories from raw data...")
+        data_path = Configuration.RAW_DATA_PATH.format(dataset.value)
+        out_path = Configuration.EXTRACTED_DATA_PATH.format(dataset.value)
+        store_path = TrajectoryStore.get_store_path(Path(out_path, "extracted_trajectories.dat"))
+        chunk_budget = memory_limit // 2
+
+        Configuration.GPS_LIMIT = Configuration.GPS_LIMITS[dataset.value]
+
+        if dataset == Dataset.OLDENBURG or dataset == Dataset.SAN_JOAQUIN:
+            DatasetUtil.extract_brinkhoff_store(Path(data_path, "raw_trajectories.dat"), store_path, chunk_budget)
+            print("Extraction OK.")
+            return DataLoader.load_extracted_data(dataset)
+
+        def split_batches(chunk):
+            batch_size = math.ceil(len(chunk) / n_jobs)
+            return [chunk[i : i + batch_size] for i in range(0, len(chunk), batch_size)]
+
+        def write_batches(writer, batches):
+            parsed_bytes = 0
+            for lengths, coordinates, times in batches:
+                offsets = np.r_[0, np.cumsum(lengths)]
+                for start, end in zip(offsets[:-1], offsets[1:]):
+                    writer.write_columns(coordinates[start:end], times[start:end])
+                parsed_bytes += coordinates.nbytes + times.nbytes
+            return parsed_bytes
+
+        time_dtype = np.float64 if dataset == Dataset.GEO_LIFE else np.int64
+        with TrajectoryStoreWriter(store_path, time_dtype=time_dtype, memory_limit=memory_limit - chunk_budget) as writer, Parallel(n_jobs=n_jobs) as parallel:
+            if dataset == Dataset.GEO_LIFE:
+                file_names = list(Path(data_path).rglob("*.plt"))
+                chunk = []
+                chunk_bytes = 0
+                for file_name in tqdm(file_names + [None]):
+                    if file_name is not None:
+                        chunk.append(file_name)
+                        chunk_bytes += os.path.getsize(file_name)
+                    if chunk and (file_name is None or chunk_bytes >= chunk_budget or len(chunk) >= chunk_size):
+                        write_batches(writer, parallel(delayed(DatasetUtil.parse_geo_life_files)(batch) for batch in split_batches(chunk)))
+                        chunk = []
+                        chunk_bytes = 0
+
+            elif dataset == Dataset.TAXI:
+                reader = pd.read_csv(Path(data_path, "data.csv"), usecols=["POLYLINE"], iterator=True)
+                row_count = min(chunk_size, 1024)
+                with tqdm() as progress:
+                    while True:
+                        try:
+                            chunk = reader.get_chunk(row_count)["POLYLINE"].to_list()
+                        except StopIteration:
+                            break
+                        parsed_bytes = write_batches(writer, parallel(delayed(DatasetUtil.parse_taxi_polylines)(batch) for batch in split_batches(chunk)))
+                        chunk_bytes = max(parsed_bytes, sum(len(polyline) for polyline in chunk))
+                        row_count = int(min(chunk_size, max(1, chunk_budget * len(chunk) // max(chunk_bytes, 1))))
+                        progress.update(len(chunk))
+
+        print("Extraction OK.")
+        return DataLoader.load_extracted_data(dataset)
+
+    @staticmethod
+    def extract_brinkhoff_store(file_name, store_path, memory_limit):
+        """
+        Extracts the trajectories of a Brinkhoff generator output file into a trajectory store.
+
+        The trajectories are ordered by their first point as in `extract_dataset`, and a trajectory whose id
+        starts over with a new "newpoint" keeps only its last run of points.
+
+        Args:
+            file_name (Path): The generator output file.
+            store_path (Path): The store directory.
+            memory_limit (int): The number of bytes of parsed points held in memory before writing them.
+        """
+        run_counts = {}
+        lengths = {}
+        with open(file_name, "r") as f:
+            for line in f:
+                flag, trajectory_id = line.split("\t", 2)[:2]
+                trajectory_id = int(trajectory_id)
+                if flag == "newpoint":
+                    run_counts[trajectory_id] = run_counts.get(trajectory_id, 0) + 1
+                    lengths[trajectory_id] = 1
+                else:
+                    lengths[trajectory_id] += 1
+
+        trajectory_ids = list(lengths.keys())
+        offsets = np.r_[0, np.cumsum([lengths[trajectory_id] for trajectory_id in trajectory_ids])].astype(np.int64)
+        starts = dict(zip(trajectory_ids, offsets[:-1].tolist()))
+        point_count = int(offsets[-1])
+
+        temp_path = TrajectoryStore.get_temp_path(store_path)
+        try:
+            coordinates = np.lib.format.open_memmap(Path(temp_path, TrajectoryStore.COORDINATES_FILE), mode="w+", dtype=np.float64, shape=(point_count, 2))
+            times = np.lib.format.open_memmap(Path(temp_path, TrajectoryStore.TIMES_FILE), mode="w+", dtype=np.int64, shape=(point_count,))
+            block_size = max(1, memory_limit // 64)
+            positions, rows, row_times = [], [], []
+            runs, next_positions = {}, {}
+            with open(file_name, "r") as f:
+                for line in f:
+                    flag, trajectory_id, _, _, t, x, y, _, _, _ = line.split("\t")
+                    trajectory_id = int(trajectory_id)
+                    if flag == "newpoint":
+                        runs[trajectory_id] = runs.get(trajectory_id, 0) + 1
+                        next_positions[trajectory_id] = starts[trajectory_id]
+                    if runs[trajectory_id] == run_counts[trajectory_id]:
+                        positions.append(next_positions[trajectory_id])
+                        rows.append((float(x), float(y)))
+                        row_times.append(int(t))
+                        next_positions[trajectory_id] += 1
+                    if len(positions) >= block_size:
+                        coordinates[positions] = rows
+                        times[positions] = row_times
+                        positions, rows, row_times = [], [], []
+            if positions:
+                coordinates[positions] = rows
+                times[positions] = row_times
+            coordinates.flush()
+            times.flush()
+            del coordinates, times
+            np.save(Path(temp_path, TrajectoryStore.OFFSETS_FILE), offsets)
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        TrajectoryStore.move_into_place(temp_path, store_path)
+
+    @staticmethod
+    def parse_geo_life_files(file_names):
+        """
+        Parses a batch of GeoLife PLT files.
+
+        Args:
+            file_names (list): The paths of the PLT files.
+
+        Returns:
+            tuple: The length of each trajectory, and the coordinates and times of all their points.
+        """
+        lengths, coordinates, times = [], [], []
+        for file_name in file_names:
+            with open(file_name, "r") as f:
+                rows = [line.split(",") for line in f.readlines()[6:]]
+            lengths.append(len(rows))
+            coordinates.extend((float(row[0]), float(row[1])) for row in rows)
+            times.extend(24 * 3600 * float(row[4]) for row in rows)
+        return np.array(lengths, dtype=np.int64), np.array(coordinates, dtype=np.float64).reshape(-1, 2), np.array(times, dtype=np.float64)
+
+    @staticmethod
+    def parse_taxi_polylines(polylines):
+        """
+        Parses a batch of taxi POLYLINE strings and timestamps their points.
+
+        Args:
+            polylines (list): The JSON-encoded polylines.
+
+        Returns:
+            tuple: The length of each trajectory, and the coordinates and times of all their points.
+        """
+        trajectories = [json.loads(polyline) for polyline in polylines]
+        lengths = np.array([len(trajectory) for trajectory in trajectories], dtype=np.int64)
+        coordinates = np.array([point for trajectory in trajectories for point in trajectory], dtype=np.float64).reshape(-1, 2)
+        times = np.concatenate([np.arange(length, dtype=np.int64) for length in lengths] or [np.empty(0, dtype=np.int64)])
+        return lengths, coordinates, times * Configuration.TARGET_INTERVAL
+
     @staticmethod
     def generate_experimental_and_correlation_dataset(dataset, copies=5):
         """
@@ -182,3 +385,69 @@ class DatasetUtil:
             ) as f:
                 json.dump(exp_trajectories, f)
         print("Generation OK.")
+
+    @staticmethod
+    def generate_split_indexes(dataset, copies=5, exp_count=1000):
+        """
+        Generates the experimental and correlation datasets of a specific dataset as index lists over shared stores.
+
+        Produces the same splits as `generate_experimental_and_correlation_dataset` for the same random state, but
+        filters the trajectories once with array masks and saves each split as a `.split.npz` index file: correlation
+        splits index the extracted store and experimental splits index one store of the long trajectories in cells.
+        Only the split files and the experimental store are replaced. JSON files and stores of the same splits are
+        kept, and the loader prefers the split files over them as long as these are newer.
+
+        Args:
+            dataset (Enum): The dataset to generate the datasets for.
+            copies (int): The number of dataset copies to generate (default: 5).
+            exp_count (int): The number of trajectories of each experimental dataset (default: 1000).
+        """
+        raw_trajectories = DataLoader.load_extracted_data(dataset, lazy=True)
+
+        print("Cleansing and generating experimental datasets...")
+        gps_limit = Configuration.GPS_LIMIT
+        coordinates = raw_trajectories.coordinates
+        out_of_range = ~(
+            (gps_limit["lat"][0] <= coordinates[:, 0])
+            & (coordinates[:, 0] < gps_limit["lat"][1])
+            & (gps_limit["lng"][0] <= coordinates[:, 1])
+            & (coordinates[:, 1] < gps_limit["lng"][1])
+        )
+        out_of_range_count = np.r_[0, np.cumsum(out_of_range)][raw_trajectories.offsets]
+        in_range = np.diff(out_of_range_count) == 0
+        is_long = raw_trajectories.get_lengths() >= 500
+
+        short_indexes = np.flatnonzero(in_range & ~is_long)
+        long_indexes = np.flatnonzero(in_range & is_long)
+
+        out_path = Configuration.CLEANSED_DATA_PATH.format(dataset.value)
+        Path(out_path).mkdir(parents=True, exist_ok=True)
+
+        exp_store_path = Path(out_path, "exp_trajectories.store")
+        with TrajectoryStoreWriter(exp_store_path, coordinate_dtype=np.int64, time_dtype=raw_trajectories.times.dtype) as writer:
+            for index in long_indexes:
+                start, end = raw_trajectories.offsets[index], raw_trajectories.offsets[index + 1]
+                writer.write_columns(Coordinates.get_cells(coordinates[start:end]), raw_trajectories.times[start:end])
+        extracted_store_path = TrajectoryStore.get_store_path(
+            Path(Configuration.EXTRACTED_DATA_PATH.format(dataset.value), "extracted_trajectories.dat")
+        )
+
+        splits = []
+        for index in range(copies):
+            selected = np.zeros(len(long_indexes), dtype=bool)
+            selected[random.choice(range(len(long_indexes)), min(len(long_indexes), exp_count), replace=False)] = True
+            splits.append(
+                (
+                    Path(out_path, "correlation_trajectories_{}.dat".format(index)),
+                    np.concatenate([short_indexes, long_indexes[~selected]]),
+                    extracted_store_path,
+                )
+            )
+            splits.append((Path(out_path, "exp_trajectories_{}.dat".format(index)), np.flatnonzero(selected), exp_store_path))
+
+        for data_path, indexes, base_path in splits:
+            TrajectorySubset.save(TrajectorySubset.get_split_path(data_path), indexes, base_path)
+            shadowed = [path for path in (data_path, TrajectoryStore.get_store_path(data_path)) if path.exists()]
+            if shadowed:
+                print("Keeping {}; the new split is loaded instead.".format(", ".join(str(path) for path in shadowed)))
+        print("Generation OK.")
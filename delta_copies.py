@@ -0,0 +1,140 @@
+import json
+from pathlib import Path
+
+
+class DeltaCopies:
+    """
+    A class for storing the fingerprinted copies of a trajectory as sparse deltas against the source trajectory.
+    """
+
+    def __init__(self, base_trajectory):
+        """
+        Initializes an empty set of copies of a source trajectory.
+
+        Args:
+            base_trajectory (list): The source trajectory as a list of tuples (x, y, time).
+        """
+        self.base_trajectory = [tuple(point) for point in base_trajectory]
+        self.deltas = []
+        self._index_deltas = None
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @staticmethod
+    def from_copies(base_trajectory, copies):
+        """
+        Builds the delta encoding of a list of fingerprinted copies.
+
+        Args:
+            base_trajectory (list): The source trajectory as a list of tuples (x, y, time).
+            copies (list): The fingerprinted copies as a list of tuples (trajectory, fp_flag).
+
+        Returns:
+            DeltaCopies: The delta-encoded copies, in the order they were given.
+        """
+        delta_copies = DeltaCopies(base_trajectory)
+        for fp_trajectory, fp_flag in copies:
+            delta_copies.add_copy(fp_trajectory, fp_flag)
+        return delta_copies
+
+    def add_copy(self, fp_trajectory, fp_flag):
+        """
+        Adds a fingerprinted copy, keeping only the points that are fingerprinted or differ from the source.
+
+        Args:
+            fp_trajectory (iterable): The fingerprinted trajectory as tuples (x, y, time).
+            fp_flag (iterable): The fingerprint flags of the trajectory.
+
+        Returns:
+            int: The party index of the added copy.
+        """
+        deltas = []
+        for index, ((base_x, base_y, _), (x_cell, y_cell, _), flag) in enumerate(
+            zip(self.base_trajectory, fp_trajectory, fp_flag)
+        ):
+            if flag or x_cell != base_x or y_cell != base_y:
+                deltas.append((index, (x_cell, y_cell)))
+        self.deltas.append(deltas)
+        self._index_deltas = None
+        return len(self.deltas) - 1
+
+    def get_copy(self, party_index):
+        """
+        Reconstructs the fingerprinted copy of a party.
+
+        Args:
+            party_index (int): The index of the party.
+
+        Returns:
+            tuple: The fingerprinted trajectory and the corresponding fingerprint flags.
+        """
+        fp_trajectory = list(self.base_trajectory)
+        fp_flag = [0] * len(fp_trajectory)
+        for index, (x_cell, y_cell) in self.deltas[party_index]:
+            fp_trajectory[index] = (x_cell, y_cell, fp_trajectory[index][2])
+            fp_flag[index] = 1
+        return fp_trajectory, fp_flag
+
+    def to_candidates(self):
+        """
+        Reconstructs all copies in the candidate format used by the detection methods.
+
+        Returns:
+            list: The fingerprinted copies as a list of tuples (trajectory, fp_flag).
+        """
+        return [self.get_copy(party_index) for party_index in range(len(self.deltas))]
+
+    def get_index_deltas(self):
+        """
+        Groups the deltas of all parties by trajectory index.
+
+        Returns:
+            dict: Maps each trajectory index to a list of tuples (party_index, (x, y)).
+        """
+        if self._index_deltas is None:
+            index_deltas = {}
+            for party_index, deltas in enumerate(self.deltas):
+                for index, cell in deltas:
+                    index_deltas.setdefault(index, []).append((party_index, cell))
+            self._index_deltas = index_deltas
+        return self._index_deltas
+
+    def save(self, path):
+        """
+        Saves the copies to a file.
+
+        Args:
+            path (str or Path): The output file path.
+        """
+        with Path(path).open("w") as f:
+            json.dump(
+                {
+                    "base": self.base_trajectory,
+                    "deltas": [
+                        [(index, x_cell, y_cell) for index, (x_cell, y_cell) in deltas]
+                        for deltas in self.deltas
+                    ],
+                },
+                f,
+            )
+
+    @staticmethod
+    def load(path):
+        """
+        Loads copies saved with `save`.
+
+        Args:
+            path (str or Path): The input file path.
+
+        Returns:
+            DeltaCopies: The loaded copies.
+        """
+        with Path(path).open("r") as f:
+            data = json.load(f)
+        delta_copies = DeltaCopies(data["base"])
+        delta_copies.deltas = [
+            [(index, (x_cell, y_cell)) for index, x_cell, y_cell in deltas]
+            for deltas in data["deltas"]
+        ]
+        return delta_copies
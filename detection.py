@@ -1,5 +1,10 @@
+import math
 import numpy as np
+from collections import defaultdict
+from joblib import Parallel, delayed
+from alignment import Alignment
 from configuration import Configuration
+from delta_copies import DeltaCopies
 
 
 class Detection:
@@ -36,3 +41,359 @@ class Detection:
 
         most_similar_index = np.argmax(scores)
         return most_similar_index, scores
+
+    @staticmethod
+    def candidates_to_array(candidates):
+        """
+        Stack candidate trajectories into one array of cells.
+
+        Args:
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+
+        Returns:
+            numpy.ndarray: The candidate cells with shape (parties, length, 2).
+        """
+        return np.array([np.asarray(cand_trajectory)[:, :2] for cand_trajectory, _ in candidates], dtype=float)
+
+    @staticmethod
+    def similarity_detection_vectorized(leak_trajectory, candidates):
+        """
+        Perform similarity detection with array operations instead of per-point loops.
+
+        Produces the same ranking as `similarity_detection`.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            candidates (list or numpy.ndarray): The candidate trajectories as a list of tuples (trajectory, _),
+                or an array of shape (parties, length, 2) as returned by `candidates_to_array`.
+
+        Returns:
+            tuple: The index of the most similar candidate trajectory and the similarity scores.
+        """
+        if not isinstance(candidates, np.ndarray):
+            candidates = Detection.candidates_to_array(candidates)
+        leak = np.asarray(leak_trajectory, dtype=float)[:, :2]
+        length = len(leak)
+
+        distances = ((candidates[:, :length] - leak) ** 2).sum(axis=2)
+        hits = distances == distances.min(axis=0)
+        scores = hits.sum(axis=1) / length
+
+        most_similar_index = np.argmax(scores)
+        return most_similar_index, scores
+
+    @staticmethod
+    def build_party_index(candidates):
+        """
+        Index the candidate parties by the cell they hold at each timestep.
+
+        Args:
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+
+        Returns:
+            list: One dict per timestep mapping a cell (lat, lng) to the list of parties holding it.
+        """
+        party_index = []
+        for party, (cand_trajectory, _) in enumerate(candidates):
+            for i, (cand_lat, cand_lng, _) in enumerate(cand_trajectory):
+                if i == len(party_index):
+                    party_index.append({})
+                party_index[i].setdefault((cand_lat, cand_lng), []).append(party)
+        return party_index
+
+    @staticmethod
+    def get_timestep_hits(leak_cell, cell_parties):
+        """
+        Find the parties whose cell is closest to the leaked cell at one timestep.
+
+        Args:
+            leak_cell (tuple): The leaked cell as a tuple (lat, lng).
+            cell_parties (dict): The party index entry of the timestep, as built by `build_party_index`.
+
+        Returns:
+            list: The parties at the minimum distance.
+        """
+        if leak_cell in cell_parties:
+            return cell_parties[leak_cell]
+
+        leak_lat, leak_lng = leak_cell
+        hits = []
+        min_distance = None
+        for (cand_lat, cand_lng), parties in cell_parties.items():
+            distance = (leak_lat - cand_lat) ** 2 + (leak_lng - cand_lng) ** 2
+            if min_distance is None or distance < min_distance:
+                min_distance = distance
+                hits = list(parties)
+            elif distance == min_distance:
+                hits += parties
+        return hits
+
+    @staticmethod
+    def inverted_index_detection(leak_trajectory, candidates, party_index=None):
+        """
+        Perform similarity detection with a per-timestep cell to party index.
+
+        Exact matches take one lookup per point and the nearest-cell search only runs over the distinct
+        cells of a timestep when no party matches, so large party counts stay cheap. Produces the same
+        ranking as `similarity_detection`.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+            party_index (list, optional): A prebuilt index from `build_party_index`, to share it across leaks.
+
+        Returns:
+            tuple: The index of the most similar candidate trajectory and the similarity scores.
+        """
+        if party_index is None:
+            party_index = Detection.build_party_index(candidates)
+        hit_counts = np.zeros(len(candidates))
+        length = len(leak_trajectory)
+
+        for i, (leak_lat, leak_lng, _) in enumerate(leak_trajectory):
+            hit_counts[Detection.get_timestep_hits((leak_lat, leak_lng), party_index[i])] += 1
+
+        scores = hit_counts / length
+        most_similar_index = np.argmax(scores)
+        return most_similar_index, scores
+
+    @staticmethod
+    def early_stopping_detection(leak_trajectory, candidates, confidence=None, min_points=1, party_index=None):
+        """
+        Perform similarity detection that stops once the leading candidate is settled.
+
+        The scan always stops when no other candidate can catch up with the leader over the remaining
+        points, which gives the same result as a full scan. With `confidence`, it also stops once the
+        leader's margin over the runner-up, counted on the points where exactly one of them hits, passes
+        a sequential Hoeffding bound. The bound spends alpha / (t * (t + 1)) at the t-th point so the
+        overall error stays below 1 - confidence.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+            confidence (float, optional): The confidence of the sequential test, e.g. 0.99. Defaults to None (exact stopping only).
+            min_points (int, optional): The number of points to examine before stopping is allowed. Defaults to 1.
+            party_index (list, optional): A prebuilt index from `build_party_index`.
+
+        Returns:
+            tuple: The index of the most similar candidate trajectory, the similarity scores over the examined
+                points, and the number of points examined.
+        """
+        if party_index is None:
+            party_index = Detection.build_party_index(candidates)
+        num_candidates = len(candidates)
+        hit_counts = np.zeros(num_candidates)
+        length = len(leak_trajectory)
+        alpha = None if confidence is None else 1 - confidence
+        if alpha and num_candidates > 1:
+            hit_history = np.zeros((length, num_candidates), dtype=bool)
+        pair, discordant_count = None, 0
+
+        examined = 0
+        for i, (leak_lat, leak_lng, _) in enumerate(leak_trajectory):
+            hits = Detection.get_timestep_hits((leak_lat, leak_lng), party_index[i])
+            hit_counts[hits] += 1
+            if alpha and num_candidates > 1:
+                hit_history[i, hits] = True
+            examined = i + 1
+            if examined < min_points:
+                continue
+
+            if num_candidates == 1:
+                break
+            leader = np.argmax(hit_counts)
+            top_two = np.argpartition(hit_counts, -2)[-2:]
+            runner = top_two[0] if top_two[1] == leader else top_two[1]
+            lead = hit_counts[leader] - hit_counts[runner]
+
+            if lead > length - examined:
+                break
+            if alpha:
+                if pair == (leader, runner):
+                    discordant_count += hit_history[i, leader] != hit_history[i, runner]
+                else:
+                    pair = (leader, runner)
+                    discordant_count = np.count_nonzero(
+                        hit_history[:examined, leader] != hit_history[:examined, runner]
+                    )
+                if lead > math.sqrt(2 * discordant_count * math.log(examined * (examined + 1) / alpha)):
+                    break
+
+        scores = hit_counts / examined
+        most_similar_index = np.argmax(scores)
+        return most_similar_index, scores, examined
+
+    @staticmethod
+    def delta_detection(leak_trajectory, delta_copies):
+        """
+        Perform similarity detection directly on delta-encoded candidate copies.
+
+        Parties that hold the source cell at a timestep share one distance computation, so the cost
+        grows with the number of deltas rather than with the number of parties.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            delta_copies (DeltaCopies): The delta-encoded candidate copies.
+
+        Returns:
+            tuple: The index of the most similar candidate trajectory and the similarity scores.
+        """
+        num_candidates = len(delta_copies)
+        hit_counts = np.zeros(num_candidates)
+        base_hit_count = 0
+        length = len(leak_trajectory)
+        index_deltas = delta_copies.get_index_deltas()
+
+        for i, (leak_lat, leak_lng, _) in enumerate(leak_trajectory):
+            base_lat, base_lng, _ = delta_copies.base_trajectory[i]
+            base_distance = (leak_lat - base_lat) ** 2 + (leak_lng - base_lng) ** 2
+
+            party_cells = index_deltas.get(i, [])
+            distances = [
+                (party_index, (leak_lat - cand_lat) ** 2 + (leak_lng - cand_lng) ** 2)
+                for party_index, (cand_lat, cand_lng) in party_cells
+            ]
+
+            candidate_distances = [distance for _, distance in distances]
+            base_held = len(party_cells) < num_candidates
+            if base_held:
+                candidate_distances.append(base_distance)
+            min_distance = min(candidate_distances)
+            base_hit = base_held and base_distance == min_distance
+            if base_hit:
+                base_hit_count += 1
+
+            for party_index, distance in distances:
+                hit_counts[party_index] += (distance == min_distance) - base_hit
+
+        scores = (hit_counts + base_hit_count) / length
+        most_similar_index = np.argmax(scores)
+        return most_similar_index, scores
+
+    @staticmethod
+    def rank_parties(scores):
+        """
+        Rank the candidate parties by their similarity scores.
+
+        Args:
+            scores (numpy.ndarray): The similarity scores of the candidates.
+
+        Returns:
+            list: Tuples (party, score) sorted by descending score, ties in party order.
+        """
+        order = np.argsort(-scores, kind="stable")
+        return [(int(party), float(scores[party])) for party in order]
+
+    @staticmethod
+    def detect_leak_group(candidates, leak_group):
+        """
+        Score a group of leaks that come from the same source trajectory.
+
+        The candidates are indexed once and shared by every leak of the group.
+
+        Args:
+            candidates (list or DeltaCopies): The candidate trajectories as a list of tuples (trajectory, _),
+                or their delta encoding.
+            leak_group (list): The leaks as a list of tuples (leak_index, leak_trajectory).
+
+        Returns:
+            list: Tuples (leak_index, ranking) with the ranking as returned by `rank_parties`.
+        """
+        results = []
+        if isinstance(candidates, DeltaCopies):
+            for leak_index, leak_trajectory in leak_group:
+                _, scores = Detection.delta_detection(leak_trajectory, candidates)
+                results.append((leak_index, Detection.rank_parties(scores)))
+        else:
+            party_index = Detection.build_party_index(candidates)
+            for leak_index, leak_trajectory in leak_group:
+                _, scores = Detection.inverted_index_detection(leak_trajectory, candidates, party_index)
+                results.append((leak_index, Detection.rank_parties(scores)))
+        return results
+
+    @staticmethod
+    def batch_detection(leaks, candidate_sets, n_jobs=16, verbose=0):
+        """
+        Detect the leaking parties of many leaked trajectories in one pass.
+
+        Leaks are grouped by source trajectory so each set of party copies is indexed once, and the groups
+        are scored in parallel.
+
+        Args:
+            leaks (list): The leaks as a list of tuples (source_id, leak_trajectory).
+            candidate_sets (dict): Maps each source id to its candidate copies, either a list of tuples
+                (trajectory, _) or a DeltaCopies.
+            n_jobs (int, optional): The number of parallel jobs. Defaults to 16.
+            verbose (int, optional): The joblib verbosity level. Defaults to 0.
+
+        Returns:
+            list: The ranked suspects of each leak, in the order of `leaks`, as lists of tuples (party, score).
+        """
+        leak_groups = defaultdict(list)
+        for leak_index, (source_id, leak_trajectory) in enumerate(leaks):
+            leak_groups[source_id].append((leak_index, leak_trajectory))
+
+        group_results = Parallel(n_jobs=n_jobs, verbose=verbose)(
+            delayed(Detection.detect_leak_group)(candidate_sets[source_id], leak_group)
+            for source_id, leak_group in leak_groups.items()
+        )
+
+        rankings = [None] * len(leaks)
+        for results in group_results:
+            for leak_index, ranking in results:
+                rankings[leak_index] = ranking
+        return rankings
+
+    @staticmethod
+    def attribute_leak(leak_trajectory, trajectory_index, candidate_sets, top_k=3):
+        """
+        Attribute a leak of unknown source to a trajectory and a party.
+
+        The trajectory index narrows the search to the `top_k` most likely source trajectories and party
+        detection only runs on their copies.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            trajectory_index (TrajectoryIndex): The index over the released source trajectories.
+            candidate_sets (dict): Maps each source id to its candidate copies, either a list of tuples
+                (trajectory, _) or a DeltaCopies.
+            top_k (int, optional): The number of source trajectories to examine. Defaults to 3.
+
+        Returns:
+            list: Tuples (source_id, party, score) of the best party of each examined source, sorted by descending score.
+        """
+        suspects = []
+        for source_id, _ in trajectory_index.query(leak_trajectory, top_k=top_k):
+            [(_, ranking)] = Detection.detect_leak_group(candidate_sets[source_id], [(0, leak_trajectory)])
+            party, score = ranking[0]
+            suspects.append((source_id, party, score))
+        return sorted(suspects, key=lambda x: -x[2])
+
+    @staticmethod
+    def aligned_detection(leak_trajectory, candidates, gram_size=3, max_stride=1):
+        """
+        Perform similarity detection on a leak that may be cropped, subsampled or shifted in time.
+
+        The leak is first aligned with the consensus of the candidate copies and only the aligned window is scored.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (lat, lng, _).
+            candidates (list): The candidate trajectories as a list of tuples (trajectory, _).
+            gram_size (int, optional): The number of cells per hashed alignment window. Defaults to 3.
+            max_stride (int, optional): The largest subsampling stride to consider. Defaults to 1.
+
+        Returns:
+            tuple: The index of the most similar candidate trajectory, the similarity scores, and the
+                (offset, stride) used for alignment, or None if the leak could not be aligned with the copies.
+        """
+        reference = Alignment.get_reference(candidates)
+        alignment = Alignment.find_offset(leak_trajectory, reference, gram_size=gram_size, max_stride=max_stride)
+        if alignment is None:
+            return None
+        offset, stride = alignment
+
+        aligned_leak, aligned_candidates = Alignment.align(leak_trajectory, candidates, offset, stride)
+        if not aligned_leak:
+            return None
+        most_similar_index, scores = Detection.inverted_index_detection(aligned_leak, aligned_candidates)
+        return most_similar_index, scores, alignment
@@ -1,4 +1,7 @@
 import math
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.special import rel_entr
 
 
 class Distance:
@@ -71,7 +74,35 @@ class Distance:
             hist2 (array-like): The second probability distribution.
 
         Returns:
-            float: The Jensen-Shannon divergence.
+            float: The Jensen-Shannon divergence (natural logarithm).
         """
-        # Add your implementation here
-        pass
+        p = np.asarray(hist1, dtype=float)
+        q = np.asarray(hist2, dtype=float)
+        p = p / p.sum()
+        q = q / q.sum()
+        m = (p + q) / 2
+        return float((rel_entr(p, m).sum() + rel_entr(q, m).sum()) / 2)
+
+    @staticmethod
+    def lb_keogh(query, candidate, window=None):
+        """
+        Calculates the LB_Keogh lower bound of the multi-dimensional DTW distance between two series.
+
+        Args:
+            query (array-like): The query series of shape (length, dimensions).
+            candidate (array-like): The candidate series of shape (length, dimensions).
+            window (int, optional): The DTW window, as in dtaidistance (shifts smaller than `window`). Defaults to None (no window).
+
+        Returns:
+            float: The lower bound, or 0 if the series lengths differ.
+        """
+        query = np.asarray(query, dtype=float)
+        candidate = np.asarray(candidate, dtype=float)
+        if len(query) != len(candidate):
+            return 0.0
+
+        size = 2 * len(candidate) + 1 if window is None else 2 * window - 1
+        upper = maximum_filter1d(candidate, size, axis=0, mode="nearest")
+        lower = minimum_filter1d(candidate, size, axis=0, mode="nearest")
+        excess = np.clip(query - upper, 0, None) ** 2 + np.clip(lower - query, 0, None) ** 2
+        return math.sqrt(excess.sum())
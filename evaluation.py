@@ -2,15 +2,27 @@ import math
 import random
 import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from joblib import Parallel, delayed
-from scipy.stats import kendalltau
-from fastdtw import dtw_ndim
+from scipy.stats import kendalltau, norm
+from dtaidistance import dtw_ndim
+from configuration import Configuration
+from sampling import Sampling
+from fingerprinting import Fingerprinting
+from attack import Attack
+from detection import Detection
+from evaluation_metric import EvaluationMetric
+from utility_index import UtilityIndex
+from distance import Distance
 
 class Evaluation:
     """
     A class for evaluating privacy-preserving techniques.
     """
 
+    worker_state = None
+    # Dataset and correlation model of a detection worker process, set once by `init_detection_worker`.
+
     @staticmethod
     def generate_sample_dataset(selected_trajectories, fp_ratio, tau, theta, correlation, debug=False):
         """
@@ -56,24 +68,278 @@ class Evaluation:
         Raises:
             RuntimeError: If an invalid utility metric is provided.
         """
-        fp_dataset = Evaluation.generate_sample_dataset(dp_dataset, fp_ratio, tau, theta, correlation, debug=debug)
-        if utility_metric == EvaluationMetric.QA_POINTS:
-            return Evaluation.eval_area_query_answering(orig_dataset, fp_dataset, grid_size=grid_size)
-        elif utility_metric == EvaluationMetric.QA_PATTERNS:
-            return Evaluation.eval_pattern_query_answering(orig_dataset, fp_dataset, grid_size=grid_size)
-        elif utility_metric == EvaluationMetric.AREA_POPULARITY:
-            return Evaluation.eval_popularity(orig_dataset, fp_dataset, grid_size=grid_size)
-        elif utility_metric == EvaluationMetric.TRIP_ERROR:
-            return Evaluation.eval_trip_error(orig_dataset, fp_dataset, grid_size=grid_size)
-        elif utility_metric == EvaluationMetric.DIAMETER_ERROR:
-            return Evaluation.eval_diameter_error(orig_dataset, fp_dataset, grid_size=grid_size)
-        elif utility_metric == EvaluationMetric.TRIP_SIMILARITY:
-            return Evaluation.evaluate_dtw_distance(orig_dataset, fp_dataset)
-        else:
+        return Evaluation.evaluate_utility_multi(
+            orig_dataset, dp_dataset, [utility_metric], fp_ratio, tau, theta, correlation, grid_size=grid_size, debug=debug
+        )[utility_metric]
+
+    @staticmethod
+    def evaluate_utility_multi(orig_dataset, dp_dataset, utility_metrics, fp_ratio, tau, theta, correlation, grid_size=10, pattern_length=3, debug=False, n_jobs=None):
+        """
+        Evaluates several utility metrics of the differential privacy (DP) dataset against the original dataset in one pass.
+
+        The protected dataset is fingerprinted once and both datasets are projected onto the evaluation grid once;
+        the metrics then share the same indexes and run concurrently.
+
+        Args:
+            orig_dataset (list): The original dataset.
+            dp_dataset (list): The protected dataset.
+            utility_metrics (list): The utility metrics to evaluate.
+            fp_ratio (float): The fingerprinting ratio.
+            tau (float): Correlation threshold.
+            theta (float): Balancing factor.
+            correlation (object): Correlation model.
+            grid_size (int, optional): Size of the grid over which some evaluation metrics are calculated. Defaults to 10.
+            pattern_length (int, optional): The number of cells per pattern of the QA_PATTERNS metric. Defaults to 3.
+            debug (bool, optional): Debug flag.
+            n_jobs (int, optional): The number of metrics evaluated concurrently. Defaults to one per metric.
+
+        Returns:
+            dict: The result of each utility metric.
+
+        Raises:
+            RuntimeError: If an invalid utility metric is provided.
+        """
+        utility_metrics = list(dict.fromkeys(utility_metrics))
+        if any(not isinstance(utility_metric, EvaluationMetric) for utility_metric in utility_metrics):
             raise RuntimeError("Invalid utility metric.")
 
+        fp_dataset = Evaluation.generate_sample_dataset(dp_dataset, fp_ratio, tau, theta, correlation, debug=debug)
+        orig_index = UtilityIndex.of(orig_dataset, grid_size)
+        fp_index = UtilityIndex.of(fp_dataset, grid_size)
+
+        # The query metrics get their own generators, seeded in a fixed order, so their queries do not depend on
+        # which thread draws first.
+        query_rngs = {
+            utility_metric: np.random.RandomState(np.random.randint(2 ** 31 - 1))
+            for utility_metric in (EvaluationMetric.QA_POINTS, EvaluationMetric.QA_PATTERNS)
+            if utility_metric in utility_metrics
+        }
+        metric_functions = {
+            EvaluationMetric.QA_POINTS: lambda: Evaluation.eval_area_query_answering(orig_index, fp_index, grid_size=grid_size, rng=query_rngs[EvaluationMetric.QA_POINTS]),
+            EvaluationMetric.QA_PATTERNS: lambda: Evaluation.eval_pattern_query_answering(orig_index, fp_index, grid_size=grid_size, pattern_length=pattern_length, rng=query_rngs[EvaluationMetric.QA_PATTERNS]),
+            EvaluationMetric.AREA_POPULARITY: lambda: Evaluation.eval_popularity(orig_index, fp_index, grid_size=grid_size),
+            EvaluationMetric.TRIP_ERROR: lambda: Evaluation.eval_trip_error(orig_index, fp_index, grid_size=grid_size),
+            EvaluationMetric.DIAMETER_ERROR: lambda: Evaluation.eval_diameter_error(orig_index, fp_index, grid_size=grid_size),
+            EvaluationMetric.TRIP_SIMILARITY: lambda: Evaluation.evaluate_dtw_distance(orig_dataset, fp_dataset),
+        }
+        if len(utility_metrics) == 1:
+            return {utility_metrics[0]: metric_functions[utility_metrics[0]]()}
+
+        # The indexes fill their tables lazily, so the tables the metrics need are built here, before the threads
+        # start. The metrics then only read the indexes and spend most of their time in numpy or compiled code.
+        for index in (orig_index, fp_index):
+            if EvaluationMetric.QA_POINTS in utility_metrics:
+                index.get_prefix_sum()
+            if EvaluationMetric.QA_PATTERNS in utility_metrics:
+                index.get_pattern_counts(pattern_length)
+            if EvaluationMetric.DIAMETER_ERROR in utility_metrics:
+                index.get_diameters()
+
+        with ThreadPoolExecutor(max_workers=n_jobs or len(utility_metrics)) as executor:
+            futures = {utility_metric: executor.submit(metric_functions[utility_metric]) for utility_metric in utility_metrics}
+            return {utility_metric: future.result() for utility_metric, future in futures.items()}
+
+    @staticmethod
+    def eval_area_query_answering(orig_dataset, fp_dataset, grid_size=10, query_count=Configuration.QUERY_REP_COUNT, rng=None):
+        """
+        Evaluates how well the fingerprinted dataset answers random area (range count) queries.
+
+        Each dataset is rasterized once into a density grid with a summed-area table, so every query is answered
+        in constant time and all queries are gathered at once.
+
+        Args:
+            orig_dataset (list or UtilityIndex): The original dataset.
+            fp_dataset (list or UtilityIndex): The fingerprinted dataset.
+            grid_size (int, optional): Size of the grid the queries are drawn on. Defaults to 10.
+            query_count (int, optional): The number of random queries. Defaults to Configuration.QUERY_REP_COUNT.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            float: The mean relative error of the query answers, with a sanity bound of 1% of the original point count.
+        """
+        rng = np.random if rng is None else rng
+        orig_index = UtilityIndex.of(orig_dataset, grid_size)
+        fp_index = UtilityIndex.of(fp_dataset, grid_size)
+
+        x_bounds = np.sort(rng.randint(0, grid_size, size=(query_count, 2)), axis=1)
+        y_bounds = np.sort(rng.randint(0, grid_size, size=(query_count, 2)), axis=1)
+        orig_counts = orig_index.range_counts(x_bounds[:, 0], y_bounds[:, 0], x_bounds[:, 1], y_bounds[:, 1])
+        fp_counts = fp_index.range_counts(x_bounds[:, 0], y_bounds[:, 0], x_bounds[:, 1], y_bounds[:, 1])
+
+        sanity_bound = max(1.0, 0.01 * len(orig_index.cell_ids))
+        return float(np.mean(np.abs(orig_counts - fp_counts) / np.maximum(orig_counts, sanity_bound)))
+
     @staticmethod
-    def evaluate_detection_accuracy(data, trial_rep_count, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attack, correlation_model, tau=Configuration.TAU, theta=Configuration.THETA, attack_ratio=0.8, collusion_count=3, p_estimate=None, debug=False, parallel=False):
+    def eval_pattern_query_answering(orig_dataset, fp_dataset, grid_size=10, pattern_length=3, query_count=Configuration.QUERY_REP_COUNT, rng=None):
+        """
+        Evaluates how well the fingerprinted dataset answers pattern (cell sequence) count queries.
+
+        The queried patterns are drawn from the windows of the original dataset and every count is a lookup in the
+        hashed pattern tables, which each UtilityIndex builds once and reuses across query draws.
+
+        Args:
+            orig_dataset (list or UtilityIndex): The original dataset.
+            fp_dataset (list or UtilityIndex): The fingerprinted dataset.
+            grid_size (int, optional): Size of the grid the trajectories are projected to. Defaults to 10.
+            pattern_length (int, optional): The number of cells per pattern. Defaults to 3.
+            query_count (int, optional): The number of random queries. Defaults to Configuration.QUERY_REP_COUNT.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            float: The mean relative error of the pattern counts.
+
+        Raises:
+            ValueError: If no original trajectory has `pattern_length` points to draw a pattern from.
+        """
+        rng = np.random if rng is None else rng
+        orig_index = UtilityIndex.of(orig_dataset, grid_size)
+        fp_index = UtilityIndex.of(fp_dataset, grid_size)
+
+        window_hashes, _ = orig_index.get_pattern_counts(pattern_length)
+        if len(window_hashes) == 0:
+            raise ValueError("No original trajectory has at least {} points to draw patterns from.".format(pattern_length))
+        query_hashes = window_hashes[rng.randint(0, len(window_hashes), size=query_count)]
+        orig_counts = orig_index.count_patterns(query_hashes, pattern_length)
+        fp_counts = fp_index.count_patterns(query_hashes, pattern_length)
+
+        return float(np.mean(np.abs(orig_counts - fp_counts) / orig_counts))
+
+    @staticmethod
+    def eval_popularity(orig_dataset, fp_dataset, grid_size=10):
+        """
+        Evaluates how well the fingerprinted dataset preserves the popularity ranking of the grid cells.
+
+        Args:
+            orig_dataset (list or UtilityIndex): The original dataset.
+            fp_dataset (list or UtilityIndex): The fingerprinted dataset.
+            grid_size (int, optional): Size of the grid the visits are counted on. Defaults to 10.
+
+        Returns:
+            float: The Kendall tau correlation between the visit counts of the cells.
+        """
+        orig_histogram = UtilityIndex.of(orig_dataset, grid_size).get_visit_histogram()
+        fp_histogram = UtilityIndex.of(fp_dataset, grid_size).get_visit_histogram()
+        return float(kendalltau(orig_histogram, fp_histogram)[0])
+
+    @staticmethod
+    def eval_trip_error(orig_dataset, fp_dataset, grid_size=10):
+        """
+        Evaluates how well the fingerprinted dataset preserves the distribution of trip start and end cells.
+
+        Args:
+            orig_dataset (list or UtilityIndex): The original dataset.
+            fp_dataset (list or UtilityIndex): The fingerprinted dataset.
+            grid_size (int, optional): Size of the grid the trips are counted on. Defaults to 10.
+
+        Returns:
+            float: The Jensen-Shannon divergence between the trip distributions.
+        """
+        orig_histogram = UtilityIndex.of(orig_dataset, grid_size).get_trip_histogram()
+        fp_histogram = UtilityIndex.of(fp_dataset, grid_size).get_trip_histogram()
+        return Distance.jsd(orig_histogram, fp_histogram)
+
+    @staticmethod
+    def eval_diameter_error(orig_dataset, fp_dataset, grid_size=10, bin_count=20):
+        """
+        Evaluates how well the fingerprinted dataset preserves the distribution of trajectory diameters.
+
+        Args:
+            orig_dataset (list or UtilityIndex): The original dataset.
+            fp_dataset (list or UtilityIndex): The fingerprinted dataset.
+            grid_size (int, optional): Size of the evaluation grid of the indexes. Defaults to 10.
+            bin_count (int, optional): The number of diameter bins, shared by both datasets. Defaults to 20.
+
+        Returns:
+            float: The Jensen-Shannon divergence between the diameter distributions.
+        """
+        orig_diameters = UtilityIndex.of(orig_dataset, grid_size).get_diameters()
+        fp_diameters = UtilityIndex.of(fp_dataset, grid_size).get_diameters()
+        bin_edges = np.histogram_bin_edges(np.r_[orig_diameters, fp_diameters], bins=bin_count)
+        return Distance.jsd(np.histogram(orig_diameters, bin_edges)[0], np.histogram(fp_diameters, bin_edges)[0])
+
+    @staticmethod
+    def evaluate_dtw_distance(orig_dataset, fp_dataset, window=None, n_jobs=16, chunk_size=64):
+        """
+        Evaluates the average DTW distance between each original trajectory and its fingerprinted copy.
+
+        The distances are computed with the compiled dtaidistance implementation, in parallel chunks of pairs.
+
+        Args:
+            orig_dataset (list): The original dataset.
+            fp_dataset (list): The fingerprinted dataset, aligned with the original one.
+            window (int, optional): The Sakoe-Chiba window (shifts smaller than `window`). Defaults to None (no window).
+            n_jobs (int, optional): The number of parallel jobs. Defaults to 16.
+            chunk_size (int, optional): The number of trajectory pairs per job. Defaults to 64.
+
+        Returns:
+            float: The mean DTW distance.
+        """
+        pairs = [
+            (Evaluation.to_dtw_series(orig_trajectory), Evaluation.to_dtw_series(fp_trajectory))
+            for orig_trajectory, fp_trajectory in zip(orig_dataset, fp_dataset)
+        ]
+        chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+        distances = Parallel(n_jobs=n_jobs)(delayed(Evaluation.dtw_distances)(chunk, window) for chunk in chunks)
+        return float(np.mean(np.concatenate(distances)))
+
+    @staticmethod
+    def dtw_distances(pairs, window=None):
+        """
+        Computes the DTW distance of each pair of series.
+
+        Args:
+            pairs (list): Tuples of series of shape (length, 2).
+            window (int, optional): The Sakoe-Chiba window. Defaults to None (no window).
+
+        Returns:
+            numpy.ndarray: The DTW distance of each pair.
+        """
+        return np.array([dtw_ndim.distance(series_1, series_2, window=window, use_c=True) for series_1, series_2 in pairs])
+
+    @staticmethod
+    def dtw_nearest_neighbour(query_trajectory, dataset, window=None):
+        """
+        Finds the trajectory of a dataset with the smallest DTW distance to a query trajectory.
+
+        Candidates are visited in order of their LB_Keogh lower bound and the search stops as soon as the bound
+        exceeds the best distance found so far, so most exact DTW computations are pruned.
+
+        Args:
+            query_trajectory (list): The query trajectory.
+            dataset (list): The trajectories to search.
+            window (int, optional): The Sakoe-Chiba window. Defaults to None (no window).
+
+        Returns:
+            tuple: The index of the nearest trajectory and its DTW distance.
+        """
+        query = Evaluation.to_dtw_series(query_trajectory)
+        candidates = [Evaluation.to_dtw_series(trajectory) for trajectory in dataset]
+        lower_bounds = np.array([Distance.lb_keogh(query, candidate, window) for candidate in candidates])
+
+        best_index, best_distance = None, math.inf
+        for index in np.argsort(lower_bounds, kind="stable"):
+            if lower_bounds[index] >= best_distance:
+                break
+            distance = dtw_ndim.distance(query, candidates[index], window=window, use_c=True)
+            if distance < best_distance:
+                best_index, best_distance = int(index), distance
+        return best_index, best_distance
+
+    @staticmethod
+    def to_dtw_series(trajectory):
+        """
+        Converts a trajectory to the contiguous (length, 2) float array expected by dtaidistance.
+
+        Args:
+            trajectory (list): The trajectory as a list of tuples (x, y, time).
+
+        Returns:
+            numpy.ndarray: The cell coordinates of the trajectory.
+        """
+        return np.ascontiguousarray(np.asarray(trajectory, dtype=np.double).reshape(len(trajectory), -1)[:, :2])
+
+    @staticmethod
+    def evaluate_detection_accuracy(data, trial_rep_count, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attack, correlation_model, tau=Configuration.TAU, theta=Configuration.THETA, attack_ratio=0.8, collusion_count=3, p_estimate=None, debug=False, parallel=False, seed=None, n_jobs=16):
         """
         Evaluate the detection accuracy of a privacy-preserving technique.
 
@@ -94,35 +360,304 @@ class Evaluation:
             p_estimate (float, optional): The probability estimate for probabilistic collusion attack. Defaults to None.
             debug (bool, optional): Enable debug mode. Defaults to False.
             parallel (bool, optional): Enable parallel execution. Defaults to False.
+            seed (int, optional): The seed of the per-trial random streams. Defaults to None (fresh entropy).
+            n_jobs (int, optional): The number of worker processes for parallel execution. Defaults to 16.
 
         Returns:
             float: The average detection accuracy.
         """
-        def single_trial(trial_index, sub_trial_rep_count, data, trajectory_count, party_count, fp_ratio, attack, correlation_model, tau, theta, attack_ratio, collusion_count, p_estimate, debug):
-            if debug:
-                print("Trial # {}".format(trial_index))
-            selected_trajectories = Sampling.sample_count(data, trajectory_count)
+        attacks = [(attack, {"attack_ratio": attack_ratio, "collusion_count": collusion_count, "p_estimate": p_estimate})]
+        [(_, _, accuracy)] = Evaluation.evaluate_detection_accuracy_multi(data, trial_rep_count, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau=tau, theta=theta, debug=debug, parallel=parallel, seed=seed, n_jobs=n_jobs)
+        return accuracy
+
+    @staticmethod
+    def evaluate_detection_accuracy_multi(data, trial_rep_count, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau=Configuration.TAU, theta=Configuration.THETA, debug=False, parallel=False, seed=None, n_jobs=16):
+        """
+        Evaluate the detection accuracy of several attacks against the same fingerprinted copies.
+
+        The party copies and the leaking parties are drawn once per trial and sub-trial and every attack is run
+        and detected against them, so comparing attacks costs one round of fingerprinting instead of one per attack.
+
+        Every trial draws from its own random stream spawned from `seed`, so the parallel path, which runs the
+        trials in a process pool that receives the dataset and correlation model once per worker, gives the same
+        results as the serial path.
+
+        Args:
+            data (list): The dataset.
+            trial_rep_count (int): The number of trial repetitions.
+            sub_trial_rep_count (int): The number of sub-trial repetitions.
+            trajectory_count (int): The number of trajectories.
+            party_count (int): The number of parties.
+            trajectory_length (int): The length of trajectories.
+            fp_ratio (float): The fingerprinting ratio.
+            attacks (list): The attacks as tuples (attack, params), where params is a dict with the optional keys
+                "attack_ratio" (default 0.8), "collusion_count" (default 3) and "p_estimate" (default fp_ratio).
+            correlation_model (object): The correlation model.
+            tau (float, optional): The threshold for similarity detection. Defaults to Configuration.TAU.
+            theta (float, optional): The threshold for probabilistic fingerprinting. Defaults to Configuration.THETA.
+            debug (bool, optional): Enable debug mode. Defaults to False.
+            parallel (bool, optional): Enable parallel execution. Defaults to False.
+            seed (int, optional): The seed of the per-trial random streams. Defaults to None (fresh entropy).
+            n_jobs (int, optional): The number of worker processes for parallel execution. Defaults to 16.
+
+        Returns:
+            list: The accuracy table as tuples (attack name, params, average detection accuracy), in the order of `attacks`.
+        """
+        trial_seeds = Evaluation.spawn_trial_seeds(seed, trial_rep_count)
+        trial_args = (sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, tau, theta, debug)
+        success_counts = np.zeros(len(attacks))
+
+        if parallel:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=Evaluation.init_detection_worker, initargs=(data, correlation_model, getattr(Configuration, "GPS_LIMIT", None))) as executor:
+                futures = [executor.submit(Evaluation.pooled_detection_trial, trial_index, trial_seed, *trial_args) for trial_index, trial_seed in enumerate(trial_seeds)]
+                for future in as_completed(futures):
+                    success_counts += [results.sum() for results in future.result()]
+        else:
+            for trial_index, trial_seed in enumerate(trial_seeds):
+                results = Evaluation.detection_trial(trial_index, data, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau, theta, debug, rng=np.random.RandomState(trial_seed))
+                success_counts += [attack_results.sum() for attack_results in results]
+
+        accuracies = success_counts / (trial_rep_count * sub_trial_rep_count)
+        return [(attack.__name__, params, float(accuracy)) for (attack, params), accuracy in zip(attacks, accuracies)]
+
+    @staticmethod
+    def evaluate_detection_accuracy_adaptive(data, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attack, correlation_model, tolerance=0.01, confidence=0.95, min_trial_count=2, max_trial_count=100, tau=Configuration.TAU, theta=Configuration.THETA, attack_ratio=0.8, collusion_count=3, p_estimate=None, debug=False, seed=None):
+        """
+        Evaluate the detection accuracy, running trials until its confidence interval is narrow enough.
+
+        After each trial the Wilson score interval of the accuracy over all sub-trials so far is updated, and the
+        evaluation stops once its width is below `tolerance` or `max_trial_count` trials have run. Sub-trials of
+        one trial share their fingerprinted copies, so the interval is a guide for stopping rather than an exact
+        coverage guarantee. The trials use the same random streams as `evaluate_detection_accuracy` with the same seed.
+
+        Args:
+            data (list): The dataset.
+            sub_trial_rep_count (int): The number of sub-trial repetitions.
+            trajectory_count (int): The number of trajectories.
+            party_count (int): The number of parties.
+            trajectory_length (int): The length of trajectories.
+            fp_ratio (float): The fingerprinting ratio.
+            attack (Attack): The attack type.
+            correlation_model (object): The correlation model.
+            tolerance (float, optional): The target width of the confidence interval. Defaults to 0.01.
+            confidence (float, optional): The confidence level of the interval. Defaults to 0.95.
+            min_trial_count (int, optional): The minimum number of trials. Defaults to 2.
+            max_trial_count (int, optional): The maximum number of trials. Defaults to 100.
+            tau (float, optional): The threshold for similarity detection. Defaults to Configuration.TAU.
+            theta (float, optional): The threshold for probabilistic fingerprinting. Defaults to Configuration.THETA.
+            attack_ratio (float, optional): The attack ratio. Defaults to 0.8.
+            collusion_count (int, optional): The number of colluding parties. Defaults to 3.
+            p_estimate (float, optional): The probability estimate for probabilistic collusion attack. Defaults to None.
+            debug (bool, optional): Enable debug mode. Defaults to False.
+            seed (int, optional): The seed of the per-trial random streams. Defaults to None (fresh entropy).
 
-            copies = [[] for _ in range(party_count)]
-            aux_info = []
-            for trajectory_id, selected_trajectory in enumerate(selected_trajectories):
-                selected_trajectory = selected_trajectory[:trajectory_length]
+        Returns:
+            tuple: The average detection accuracy, its confidence interval (low, high) and the number of trials run.
 
-                if debug:
-                    print("Generating fingerprinted copies.")
+        Raises:
+            ValueError: If `max_trial_count` is smaller than one or than `min_trial_count`.
+        """
+        if max_trial_count < max(1, min_trial_count):
+            raise ValueError("max_trial_count must be at least max(1, min_trial_count).")
 
-                for party_index in range(party_count):
-                    copies[party_index].append(Fingerprinting.probabilistic_fingerprint(selected_trajectory, tau, fp_ratio, theta, correlation_model, debug=False))
+        attacks = [(attack, {"attack_ratio": attack_ratio, "collusion_count": collusion_count, "p_estimate": p_estimate})]
+        success_count = 0
+        total_count = 0
+        interval = (0.0, 1.0)
 
-            results = np.zeros(sub_trial_rep_count)
+        for trial_index, trial_seed in enumerate(Evaluation.spawn_trial_seeds(seed, max_trial_count)):
+            [results] = Evaluation.detection_trial(trial_index, data, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau, theta, debug, rng=np.random.RandomState(trial_seed))
+            success_count += results.sum()
+            total_count += len(results)
+            interval = Evaluation.wilson_interval(success_count, total_count, confidence)
             if debug:
-                print("Performing attack...")
-            for sub_trial_index in range(sub_trial_rep_count):
-                if attack == Attack.correlation_attack or attack == Attack.random_distortion_attack:
-                    assert attack_ratio
-                    leak_party_indexes = Sampling.sample_count(party_count, 1)
-                else:
-                    assert collusion_count > 1
-                    leak_party_indexes = Sampling.sample_count(party_count, collusion_count)
-
-                sus
+                print("Trial # {}: accuracy {:.4f}, interval [{:.4f}, {:.4f}]".format(trial_index, success_count / total_count, *interval))
+            if trial_index + 1 >= min_trial_count and interval[1] - interval[0] < tolerance:
+                break
+
+        return float(success_count / total_count), interval, trial_index + 1
+
+    @staticmethod
+    def wilson_interval(success_count, total_count, confidence=0.95):
+        """
+        Computes the Wilson score interval of a binomial proportion.
+
+        Args:
+            success_count (int): The number of successes.
+            total_count (int): The number of observations.
+            confidence (float, optional): The confidence level. Defaults to 0.95.
+
+        Returns:
+            tuple: The lower and upper bounds of the interval.
+        """
+        z = norm.ppf(1 - (1 - confidence) / 2)
+        proportion = success_count / total_count
+        denominator = 1 + z ** 2 / total_count
+        center = (proportion + z ** 2 / (2 * total_count)) / denominator
+        half_width = z / denominator * math.sqrt(proportion * (1 - proportion) / total_count + z ** 2 / (4 * total_count ** 2))
+        return float(max(0.0, center - half_width)), float(min(1.0, center + half_width))
+
+    @staticmethod
+    def spawn_trial_seeds(seed, trial_rep_count):
+        """
+        Derives independent seeds for the random streams of the trials.
+
+        Args:
+            seed (int): The root seed, or None for fresh entropy.
+            trial_rep_count (int): The number of trials.
+
+        Returns:
+            list: One seed, as an array of uint32 words, per trial.
+        """
+        return [child.generate_state(4) for child in np.random.SeedSequence(seed).spawn(trial_rep_count)]
+
+    @staticmethod
+    def init_detection_worker(data, correlation_model, gps_limit):
+        """
+        Stores the shared dataset and correlation model in a detection worker process.
+
+        Args:
+            data (list): The dataset.
+            correlation_model (object): The correlation model.
+            gps_limit (dict): The GPS limits of the dataset, as set on the Configuration of the parent process.
+        """
+        if gps_limit is not None:
+            Configuration.GPS_LIMIT = gps_limit
+        Evaluation.worker_state = (data, correlation_model)
+
+    @staticmethod
+    def pooled_detection_trial(trial_index, trial_seed, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, tau, theta, debug=False):
+        """
+        Runs `detection_trial` in a worker process on the dataset and correlation model of `init_detection_worker`.
+
+        Returns:
+            list: One array of sub-trial results per attack.
+        """
+        data, correlation_model = Evaluation.worker_state
+        return Evaluation.detection_trial(trial_index, data, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau, theta, debug, rng=np.random.RandomState(trial_seed))
+
+    @staticmethod
+    def detection_trial(trial_index, data, sub_trial_rep_count, trajectory_count, party_count, trajectory_length, fp_ratio, attacks, correlation_model, tau, theta, debug=False, rng=None):
+        """
+        Run one detection trial: fingerprint the sampled trajectories once, then attack and detect in every sub-trial.
+
+        Args:
+            trial_index (int): The index of the trial.
+            data (list): The dataset.
+            sub_trial_rep_count (int): The number of sub-trial repetitions.
+            trajectory_count (int): The number of trajectories.
+            party_count (int): The number of parties.
+            trajectory_length (int): The length of trajectories.
+            fp_ratio (float): The fingerprinting ratio.
+            attacks (list): The attacks as tuples (attack, params), see `evaluate_detection_accuracy_multi`.
+            correlation_model (object): The correlation model.
+            tau (float): The threshold for similarity detection.
+            theta (float): The threshold for probabilistic fingerprinting.
+            debug (bool, optional): Enable debug mode. Defaults to False.
+            rng (RandomState, optional): The random generator of the trial. Defaults to the global numpy generator.
+
+        Returns:
+            list: One array of sub-trial results (1 if a leaking party was detected, 0 otherwise) per attack.
+        """
+        if debug:
+            print("Trial # {}".format(trial_index))
+        selected_trajectories = Sampling.sample_count(data, trajectory_count, rng=rng)
+
+        if debug:
+            print("Generating fingerprinted copies.")
+        copies = Evaluation.generate_party_copies(selected_trajectories, trajectory_length, party_count, fp_ratio, tau, theta, correlation_model, rng=rng)
+        candidate_sets = [[party_copies[trajectory_id] for party_copies in copies] for trajectory_id in range(len(selected_trajectories))]
+        party_indexes = [Detection.build_party_index(candidates) for candidates in candidate_sets]
+
+        leaker_count = 1
+        for attack, params in attacks:
+            if attack == Attack.correlation_attack or attack == Attack.random_distortion_attack:
+                assert params.get("attack_ratio", 0.8)
+            else:
+                assert params.get("collusion_count", 3) > 1
+                leaker_count = max(leaker_count, params.get("collusion_count", 3))
+
+        results = [np.zeros(sub_trial_rep_count) for _ in attacks]
+        if debug:
+            print("Performing attack...")
+        for sub_trial_index in range(sub_trial_rep_count):
+            trajectory_id = sub_trial_index % len(selected_trajectories)
+            leak_party_indexes = Sampling.sample_count(party_count, leaker_count, rng=rng)
+
+            for attack_index, (attack, params) in enumerate(attacks):
+                leak_trajectory, attack_party_indexes = Evaluation.perform_attack(attack, params, copies, trajectory_id, leak_party_indexes, fp_ratio, tau, correlation_model, rng=rng)
+                suspect, _ = Detection.inverted_index_detection(leak_trajectory, candidate_sets[trajectory_id], party_indexes[trajectory_id])
+                results[attack_index][sub_trial_index] = suspect in attack_party_indexes
+
+        return results
+
+    @staticmethod
+    def generate_party_copies(selected_trajectories, trajectory_length, party_count, fp_ratio, tau, theta, correlation_model, rng=None):
+        """
+        Generates the fingerprinted copies of every party for the selected trajectories.
+
+        Args:
+            selected_trajectories (list): Selected trajectory data.
+            trajectory_length (int): The length the trajectories are cut to.
+            party_count (int): The number of parties.
+            fp_ratio (float): The fingerprinting ratio.
+            tau (float): Correlation threshold.
+            theta (float): Balancing factor.
+            correlation_model (object): Correlation model.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            list: The copies of each party, indexed as copies[party_index][trajectory_id] = (trajectory, fp_flag).
+        """
+        copies = [[] for _ in range(party_count)]
+        for selected_trajectory in selected_trajectories:
+            selected_trajectory = selected_trajectory[:trajectory_length]
+            for party_index in range(party_count):
+                copies[party_index].append(Fingerprinting.probabilistic_fingerprint(selected_trajectory, tau, fp_ratio, theta, correlation_model, debug=False, rng=rng))
+        return copies
+
+    @staticmethod
+    def perform_attack(attack, params, copies, trajectory_id, leak_party_indexes, fp_ratio, tau, correlation_model, rng=None):
+        """
+        Applies an attack to the copies of the leaking parties.
+
+        Args:
+            attack (Attack): The attack type.
+            params (dict): The attack parameters, see `evaluate_detection_accuracy_multi`.
+            copies (list): The party copies as returned by `generate_party_copies`.
+            trajectory_id (int): The index of the attacked trajectory.
+            leak_party_indexes (list): The drawn leaking parties; single-party attacks use the first one and
+                collusion attacks the first collusion_count ones.
+            fp_ratio (float): The fingerprinting ratio, used when no p_estimate is given.
+            tau (float): Correlation threshold.
+            correlation_model (object): Correlation model.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            tuple: The leak trajectory and the parties that took part in the attack.
+
+        Raises:
+            RuntimeError: If an invalid attack is provided.
+        """
+        attack_ratio = params.get("attack_ratio", 0.8)
+        collusion_count = params.get("collusion_count", 3)
+        p_estimate = params.get("p_estimate")
+        if p_estimate is None:
+            p_estimate = fp_ratio
+
+        if attack == Attack.random_distortion_attack:
+            leak_party_indexes = leak_party_indexes[:1]
+            leak_trajectory = Attack.random_distortion_attack(copies[leak_party_indexes[0]][trajectory_id][0], attack_ratio, rng=rng)
+        elif attack == Attack.correlation_attack:
+            leak_party_indexes = leak_party_indexes[:1]
+            leak_trajectory = Attack.correlation_attack(copies[leak_party_indexes[0]][trajectory_id][0], tau, attack_ratio, correlation_model, rng=rng)
+        elif attack == Attack.majority_collusion_attack:
+            leak_party_indexes = leak_party_indexes[:collusion_count]
+            leak_trajectory = Attack.majority_collusion_attack([copies[party_index][trajectory_id][0] for party_index in leak_party_indexes], rng=rng)
+        elif attack == Attack.probabilistic_collusion_attack:
+            leak_party_indexes = leak_party_indexes[:collusion_count]
+            leak_trajectory = Attack.probabilistic_collusion_attack([copies[party_index][trajectory_id][0] for party_index in leak_party_indexes], p_estimate, tau, correlation_model, attack_ratio, rng=rng)
+        else:
+            raise RuntimeError("Invalid attack.")
+
+        return leak_trajectory, leak_party_indexes
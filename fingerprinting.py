@@ -1,3 +1,7 @@
+import hashlib
+import hmac
+import math
+import numpy as np
 from sampling import Sampling
 
 class Fingerprinting:
@@ -6,7 +10,56 @@ class Fingerprinting:
     """
 
     @staticmethod
-    def probabilistic_fingerprint(trajectory, tau, p, theta, correlation, debug=False):
+    def get_keyed_rng(master_secret, party_id, trajectory_id):
+        """
+        Derive the random generator of one party copy from the master secret.
+
+        The seed is an HMAC-SHA256 of the (party id, trajectory id) pair under the master secret,
+        so the same key always yields the same generator and copies need not be stored.
+
+        Args:
+            master_secret (str or bytes): The secret shared by all fingerprinted releases.
+            party_id (int): The identifier of the receiving party.
+            trajectory_id (int): The identifier of the fingerprinted trajectory.
+
+        Returns:
+            RandomState: A generator seeded for the given party and trajectory.
+        """
+        if isinstance(master_secret, str):
+            master_secret = master_secret.encode("utf-8")
+        message = "{}:{}".format(party_id, trajectory_id).encode("utf-8")
+        digest = hmac.new(master_secret, message, hashlib.sha256).digest()
+        return np.random.RandomState(np.frombuffer(digest, dtype=np.uint32))
+
+    @staticmethod
+    def keyed_fingerprint(trajectory, tau, p, theta, correlation, master_secret, party_id, trajectory_id, debug=False):
+        """
+        Generate the probabilistic fingerprint of a party copy from its key.
+
+        Calling this again with the same key, trajectory, parameters and correlation model
+        regenerates the copy bit for bit, e.g. lazily during detection.
+
+        Args:
+            trajectory (list): The trajectory to generate the fingerprint for.
+            tau (float): The transition threshold for sampling candidates.
+            p (float): The initial probability of fingerprinting a cell.
+            theta (float): The adjustment parameter for the probability.
+            correlation (Correlation): The correlation model for emission and transition probabilities.
+            master_secret (str or bytes): The secret shared by all fingerprinted releases.
+            party_id (int): The identifier of the receiving party.
+            trajectory_id (int): The identifier of the fingerprinted trajectory.
+            debug (bool, optional): Enable debug mode. Defaults to False.
+
+        Returns:
+            tuple: The fingerprinted trajectory and the corresponding fingerprint flags.
+        """
+        rng = Fingerprinting.get_keyed_rng(master_secret, party_id, trajectory_id)
+        return Fingerprinting.probabilistic_fingerprint(
+            trajectory, tau, p, theta, correlation, debug=debug, rng=rng
+        )
+
+    @staticmethod
+    def probabilistic_fingerprint(trajectory, tau, p, theta, correlation, debug=False, rng=None):
         """
         Generate a probabilistic fingerprint for a trajectory.
 
@@ -17,27 +70,61 @@ class Fingerprinting:
             theta (float): The adjustment parameter for the probability.
             correlation (Correlation): The correlation model for emission and transition probabilities.
             debug (bool, optional): Enable debug mode. Defaults to False.
+            rng (RandomState, optional): The random generator to sample from. Defaults to the global numpy generator.
 
         Returns:
             tuple: The fingerprinted trajectory and the corresponding fingerprint flags.
         """
         fp_trajectory = []
         fp_flag = []
+        for point, fp_state in Fingerprinting.probabilistic_fingerprint_stream(
+            trajectory, tau, p, theta, correlation, debug=debug, rng=rng
+        ):
+            fp_trajectory.append(point)
+            fp_flag.append(fp_state)
+        return fp_trajectory, fp_flag
+
+    @staticmethod
+    def probabilistic_fingerprint_stream(trajectory, tau, p, theta, correlation, debug=False, rng=None):
+        """
+        Generate a probabilistic fingerprint for a trajectory point by point.
+
+        The fingerprinted copy is never materialized, so the memory footprint does not
+        depend on the trajectory length and the output can be written out as it is produced.
+
+        Args:
+            trajectory (iterable): The trajectory to generate the fingerprint for, as (x, y, time) tuples.
+            tau (float): The transition threshold for sampling candidates.
+            p (float): The initial probability of fingerprinting a cell.
+            theta (float): The adjustment parameter for the probability.
+            correlation (Correlation): The correlation model for emission and transition probabilities.
+            debug (bool, optional): Enable debug mode. Defaults to False.
+            rng (RandomState, optional): The random generator to sample from. Defaults to the global numpy generator.
+
+        Yields:
+            tuple: The fingerprinted point (x, y, time) and its fingerprint flag.
+        """
         assert p >= 0
+        points = iter(trajectory)
 
         if p == 0:
             if debug:
                 print("p = 0, return origin")
-            for x_cell, y_cell, time in trajectory:
-                fp_trajectory.append((x_cell, y_cell, time))
-                fp_flag.append(0)
-            return fp_trajectory, fp_flag
+            for x_cell, y_cell, time in points:
+                yield (x_cell, y_cell, time), 0
+            return
+
+        first_point = next(points, None)
+        if first_point is None:
+            return
 
+        block_size = math.ceil(1 / p)
         block_count = 0
         fp_count = 0
+        length = 0
         p_current = p
 
-        x_cell, y_cell, true_time = trajectory[0]
+        x_cell, y_cell, true_time = first_point
         if debug:
             print("First cell truth: %5d, %5d, %10.2f" % (x_cell, y_cell, true_time))
 
@@ -47,15 +134,15 @@ class Fingerprinting:
             sampled_lat,
             sampled_lng,
         ), fp_state = Sampling.sample_proportionally_with_truth(
-            distribution, (x_cell, y_cell), p_current
+            distribution, (x_cell, y_cell), p_current, rng=rng
         )
         if debug:
             print("Sampled: ", sampled_lat, sampled_lng, "FP:", fp_state)
 
-        prev_lat, prev_lng, prev_time = sampled_lat, sampled_lng, true_time
+        prev_lat, prev_lng = sampled_lat, sampled_lng
 
-        fp_trajectory.append((sampled_lat, sampled_lng, true_time))
-        fp_flag.append(fp_state)
+        yield (sampled_lat, sampled_lng, true_time), fp_state
+        length += 1
         if fp_state:
             fp_count += 1
             if debug:
@@ -63,7 +150,7 @@ class Fingerprinting:
 
         block_count += 1
 
-        for true_lat, true_lng, true_time in trajectory[1:]:
+        for true_lat, true_lng, true_time in points:
             if debug:
                 print("Prev:", prev_lat, prev_lng, "Truth: ", true_lat, true_lng)
 
@@ -78,6 +165,7 @@ class Fingerprinting:
                 correlation,
                 replace=True,
                 debug=False,
+                rng=rng,
             )
 
             if debug:
@@ -92,10 +180,10 @@ class Fingerprinting:
                     ")",
                 )
 
-            prev_lat, prev_lng, prev_time = sampled_lat, sampled_lng, true_time
+            prev_lat, prev_lng = sampled_lat, sampled_lng
 
-            fp_trajectory.append((sampled_lat, sampled_lng, true_time))
-            fp_flag.append(fp_state)
+            yield (sampled_lat, sampled_lng, true_time), fp_state
+            length += 1
             if fp_state:
                 fp_count += 1
                 if debug:
@@ -103,8 +191,7 @@ class Fingerprinting:
 
             block_count += 1
 
-            if block_count >= math.ceil(1 / p):
-                length = len(fp_trajectory)
+            if block_count >= block_size:
                 if debug:
                     print("FP_COUNT: %d, Expected: %.2f" % (fp_count, p * length))
                 if fp_count > p * length:
@@ -118,5 +205,3 @@ class Fingerprinting:
                     p_current = 1
 
                 block_count = 0
-
-        return fp_trajectory, fp_flag
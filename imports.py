@@ -9,7 +9,7 @@ from pathlib import PurePath
 from joblib import Parallel, delayed
 from collections import defaultdict
 from shapely.geometry import Polygon, Point
-from scipy.spatial import ConvexHull
+from scipy.spatial import ConvexHull, QhullError
 import pandas as pd
 import math
 from dtaidistance import dtw_ndim
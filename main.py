@@ -21,14 +21,14 @@ trial_rep_count = 10
 sub_trial_rep_count = 200
 trajectory_count = 1
 
-# Set dataset
-dataset = Dataset.urbanmob
+# Set dataset (urbanmob has no raw extractor; it needs data/urbanmob/extracted/ in place instead)
+dataset = Dataset.GEO_LIFE
 
 # Extract dataset from raw file(s)
-DatasetUtil.extract_dataset(dataset)
+DatasetUtil.stream_extract_dataset(dataset)
 
 # # Generate cleansed datasets from extracted files (5 copies)
-DatasetUtil.generate_experimental_and_correlation_dataset(dataset)
+DatasetUtil.generate_split_indexes(dataset)
 
 index = 0  # use the first copy
 
@@ -36,7 +36,7 @@ index = 0  # use the first copy
 correlation_model = Correlation(DataLoader.load_correlation_data(dataset, index))
 
 # Load data
-orig_data = DataLoader.load_experimental_data(dataset, index)
+orig_data = DataLoader.load_experimental_data(dataset, index, lazy=True)
 
 # Select trajectories of interest
 selected_trajectory_data = orig_data[:100]
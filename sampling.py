@@ -10,9 +10,10 @@ class Sampling:
     """
 
     @staticmethod
-    def sample_proportionally_with_truth(candidates, truth, p):
+    def sample_proportionally_with_truth(candidates, truth, p, rng=None):
+        rng = random if rng is None else rng
         if sum(candidates.values()) <= 0:
-            sampled_cell = list(candidates.keys())[random.randint(len(candidates))]
+            sampled_cell = list(candidates.keys())[rng.randint(len(candidates))]
         else:
             if truth:
                 total = sum(candidates.values()) - candidates[truth]
@@ -27,7 +28,7 @@ class Sampling:
                 total = sum(candidates.values())
                 candidates = {key: value / total for key, value in candidates.items()}
             sampled_cell = list(candidates.keys())[
-                random.choice(
+                rng.choice(
                     range(len(candidates)),
                     p=[candidates[key] for key in candidates.keys()],
                 )
@@ -50,7 +51,7 @@ class Sampling:
 
     @staticmethod
     def sample_candidates_vanilla(
-        prev_cell, true_cell, p, tau, correlation, replace=True, debug=False
+        prev_cell, true_cell, p, tau, correlation, replace=True, debug=False, rng=None
     ):
         candidates = correlation.get_transition(prev_cell)
         filtered_candidates = dict(filter(lambda x: x[1] >= tau, candidates.items()))
@@ -59,23 +60,23 @@ class Sampling:
             sampled_cell, fp_state = true_cell, 0
         elif true_cell not in filtered_candidates.keys():
             sampled_cell, fp_state = Sampling.sample_proportionally_with_truth(
-                filtered_candidates, None, None
+                filtered_candidates, None, None, rng=rng
             )
         else:
             if filtered_candidates[true_cell] == sum(filtered_candidates.values()):
                 sampled_cell = Sampling.sample_nearby_point(
-                    true_cell, Configuration.SCALE
+                    true_cell, Configuration.SCALE, rng=rng
                 )
                 fp_state = 1
             else:
                 sampled_cell, fp_state = Sampling.sample_proportionally_with_truth(
-                    filtered_candidates, true_cell, p
+                    filtered_candidates, true_cell, p, rng=rng
                 )
         return sampled_cell, fp_state
 
     @staticmethod
     def sample_candidates(
-        prev_cell, true_cell, p, tau, correlation=None, replace=True, debug=False
+        prev_cell, true_cell, p, tau, correlation=None, replace=True, debug=False, rng=None
     ):
         (
             candidates,
@@ -90,11 +91,11 @@ class Sampling:
         if true_cell in tau_dist_candidates.keys():
             if len(tau_dist_candidates) > 1:
                 sampled_cell, fp_state = Sampling.sample_proportionally_with_truth(
-                    tau_dist_candidates, true_cell, p
+                    tau_dist_candidates, true_cell, p, rng=rng
                 )
             elif len(tau_candidates) > 1:
                 sampled_cell, fp_state = Sampling.sample_proportionally_with_truth(
-                    tau_candidates, true_cell, p
+                    tau_candidates, true_cell, p, rng=rng
                 )
             else:
                 sampled_cell, fp_state = true_cell, 0
@@ -106,14 +107,14 @@ class Sampling:
                         temp_true_cell, true_cell
                     ) < Distance.sq_euclidean(prev_cell, true_cell):
                         sampled_cell, _ = Sampling.sample_proportionally_with_truth(
-                            tau_candidates, temp_true_cell, p
+                            tau_candidates, temp_true_cell, p, rng=rng
                         )
                         fp_state = 1
                     else:
                         sampled_cell, fp_state = true_cell, 0
                 else:
                     sampled_cell, _ = Sampling.sample_proportionally_with_truth(
-                        tau_candidates, None, None
+                        tau_candidates, None, None, rng=rng
                     )
                     fp_state = 1
             else:
@@ -149,28 +150,42 @@ class Sampling:
         return alter_points
 
     @staticmethod
-    def sample_nearby_point(point, scale):
+    def sample_nearby_point(point, scale, rng=None):
+        rng = random if rng is None else rng
         lat, lng = point
         while True:
-            new_lat = int(lat + random.uniform(-scale, scale + 1))
-            new_lng = int(lng + random.uniform(-scale, scale + 1))
+            new_lat = int(lat + rng.uniform(-scale, scale + 1))
+            new_lng = int(lng + rng.uniform(-scale, scale + 1))
             if new_lat != lat or new_lng != lng:
                 break
         return new_lat, new_lng
 
     @staticmethod
-    def sample_portion(candidates, portion):
+    def sample_nearby_points(points, scale, rng=None):
+        rng = random if rng is None else rng
+        points = np.asarray(points)
+        new_points = points.copy()
+        pending = np.ones(len(points), dtype=bool)
+        while pending.any():
+            offsets = rng.uniform(-scale, scale + 1, size=(pending.sum(), 2))
+            new_points[pending] = (points[pending] + offsets).astype(points.dtype)
+            pending = (new_points == points).all(axis=1)
+        return new_points
+
+    @staticmethod
+    def sample_portion(candidates, portion, rng=None):
         count = int(portion * len(candidates))
-        return Sampling.sample_count(candidates, count)
+        return Sampling.sample_count(candidates, count, rng=rng)
 
     @staticmethod
-    def sample_count(candidates, count):
+    def sample_count(candidates, count, rng=None):
+        rng = random if rng is None else rng
         if type(candidates) == int:
-            return random.choice(
+            return rng.choice(
                 range(candidates), max(1, count), replace=False
             ).tolist()
         else:
-            indexes = random.choice(
+            indexes = rng.choice(
                 range(len(candidates)), max(1, count), replace=False
             )
             return [candidates[index] for index in indexes]
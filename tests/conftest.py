@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from configuration import Configuration
+
+
+@pytest.fixture(autouse=True)
+def unit_grid(monkeypatch):
+    """
+    Maps GPS points in [0, 1) x [0, 1) to a 50 x 50 grid for the duration of a test.
+    """
+    monkeypatch.setattr(Configuration, "GPS_LIMIT", {"lat": (0.0, 1.0), "lng": (0.0, 1.0)}, raising=False)
+    monkeypatch.setattr(Configuration, "GRID_SIZE", 50)
+
+
+def random_walk(length, seed, interval=60):
+    """
+    Generates a random walk in the unit square.
+
+    Args:
+        length (int): The number of points.
+        seed (int): The seed of the walk.
+        interval (int or float): The time between two points (default: 60).
+
+    Returns:
+        list: The walk as a list of tuples (x, y, time).
+    """
+    rng = np.random.RandomState(seed)
+    x, y = rng.uniform(0.3, 0.7, 2)
+    trajectory = []
+    for i in range(length):
+        x = min(max(x + rng.normal(0, 0.01), 0.0), 0.999)
+        y = min(max(y + rng.normal(0, 0.01), 0.0), 0.999)
+        trajectory.append((float(x), float(y), i * interval))
+    return trajectory
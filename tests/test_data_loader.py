@@ -0,0 +1,83 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+from conftest import random_walk
+from configuration import Configuration
+from data_loader import DataLoader
+from dataset import Dataset
+from dataset_util import DatasetUtil
+from trajectory_store import TrajectoryStore
+from trajectory_subset import TrajectorySubset
+
+
+def write_json(path, trajectories):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as f:
+        json.dump(trajectories, f)
+
+
+def load_json(path):
+    with path.open("r") as f:
+        return [[tuple(point) for point in trajectory] for trajectory in json.load(f)]
+
+
+def test_split_round_trip(tmp_path):
+    base_path = tmp_path / "extracted" / "extracted_trajectories.dat"
+    write_json(base_path, [random_walk(10 + seed, seed) for seed in range(5)])
+    TrajectoryStore.from_json(base_path)
+    data_path = tmp_path / "cleansed" / "correlation_trajectories_0.dat"
+    data_path.parent.mkdir()
+    TrajectorySubset.save(TrajectorySubset.get_split_path(data_path), [3, 0, 4], TrajectoryStore.get_store_path(base_path))
+
+    subset = DataLoader.load_trajectories(data_path)
+
+    assert isinstance(subset, TrajectorySubset)
+    expected = load_json(base_path)
+    assert subset.to_list() == [expected[3], expected[0], expected[4]]
+    assert subset[1:].to_list() == [expected[0], expected[4]]
+
+
+def test_split_over_newer_base_is_not_used(tmp_path):
+    base_path = tmp_path / "extracted_trajectories.dat"
+    write_json(base_path, [random_walk(10, seed) for seed in range(3)])
+    data_path = tmp_path / "exp_trajectories_0.dat"
+    write_json(data_path, [random_walk(10, 50)])
+    split_path = TrajectorySubset.get_split_path(data_path)
+    TrajectorySubset.save(split_path, [1], TrajectoryStore.get_store_path(base_path))
+    split_time = split_path.stat().st_mtime_ns
+    os.utime(data_path, ns=(split_time - 10 ** 9, split_time - 10 ** 9))
+
+    assert isinstance(DataLoader.load_trajectories(data_path), TrajectorySubset)
+
+    os.utime(base_path, ns=(split_time + 10 ** 9, split_time + 10 ** 9))
+
+    assert DataLoader.load_trajectories(data_path) == [[list(point) for point in random_walk(10, 50)]]
+
+
+def test_generated_splits_match_generated_json(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(Configuration.GPS_LIMITS, Dataset.TAXI.value, {"lat": (0.0, 1.0), "lng": (0.0, 1.0)})
+    trajectories = [random_walk(length, seed) for seed, length in enumerate([40, 600, 30, 520, 700, 10])]
+    trajectories[2][5] = (1.5, 0.5, 300)
+    extracted_path = Path(Configuration.EXTRACTED_DATA_PATH.format(Dataset.TAXI.value), "extracted_trajectories.dat")
+    write_json(extracted_path, trajectories)
+
+    np.random.seed(3)
+    DatasetUtil.generate_experimental_and_correlation_dataset(Dataset.TAXI, copies=2)
+    out_path = Path(Configuration.CLEANSED_DATA_PATH.format(Dataset.TAXI.value))
+    expected = {data_path.name: load_json(data_path) for data_path in out_path.glob("*.dat")}
+    np.random.seed(3)
+    DatasetUtil.generate_split_indexes(Dataset.TAXI, copies=2)
+
+    assert len(expected) == 4
+    for name, trajectories in expected.items():
+        assert (out_path / name).exists()
+        subset = DataLoader.load_trajectories(out_path / name)
+        assert isinstance(subset, TrajectorySubset)
+        assert subset.to_list() == trajectories
+    assert DataLoader.load_experimental_data(Dataset.TAXI, 0).store.coordinates.dtype == np.int64
+
+    hits = DataLoader.read_split.cache_info().hits
+    DataLoader.load_experimental_data(Dataset.TAXI, 0)
+    assert DataLoader.read_split.cache_info().hits > hits
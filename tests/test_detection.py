@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from detection import Detection
+
+
+def make_candidates(seed, party_count=12, length=40, grid_size=6):
+    """
+    Generates candidate copies that share most cells, so that ties and near misses are common.
+    """
+    rng = np.random.RandomState(seed)
+    source = rng.randint(0, grid_size, size=(length, 2))
+    candidates = []
+    for _ in range(party_count):
+        cells = np.where(rng.rand(length, 1) < 0.3, rng.randint(0, grid_size, size=(length, 2)), source)
+        candidates.append(([(int(x), int(y), t) for t, (x, y) in enumerate(cells)], None))
+    leaked_cells = np.array(candidates[0][0])[:, :2]
+    leak_cells = np.where(rng.rand(length, 1) < 0.2, rng.randint(0, grid_size, size=(length, 2)), leaked_cells)
+    leak = [(int(x), int(y), t) for t, (x, y) in enumerate(leak_cells)]
+    return leak, candidates
+
+
+def assert_same_ranking(scores, expected_scores):
+    # The exact detector sums 1 / length per hit, the fast ones divide hit counts, so scores differ by rounding.
+    ranking, expected = Detection.rank_parties(scores), Detection.rank_parties(expected_scores)
+    assert [party for party, _ in ranking] == [party for party, _ in expected]
+    assert [score for _, score in ranking] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fast_detectors_rank_like_exact_detection(seed):
+    leak, candidates = make_candidates(seed)
+
+    exact_index, exact_scores = Detection.similarity_detection(leak, candidates)
+
+    vectorized_index, vectorized_scores = Detection.similarity_detection_vectorized(leak, candidates)
+    assert vectorized_index == exact_index
+    assert_same_ranking(vectorized_scores, exact_scores)
+
+    indexed_index, indexed_scores = Detection.inverted_index_detection(leak, candidates)
+    assert indexed_index == exact_index
+    assert_same_ranking(indexed_scores, exact_scores)
+
+    stopped_index, _, examined = Detection.early_stopping_detection(leak, candidates)
+    assert stopped_index == exact_index
+    assert examined <= len(leak)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from conftest import random_walk
+from attack import Attack
+from correlation import Correlation
+from evaluation import Evaluation
+from evaluation_metric import EvaluationMetric
+from trajectory_util import TrajectoryUtil
+
+
+@pytest.fixture
+def correlation():
+    return Correlation([[(x, y) for x, y, _ in random_walk(300, seed)] for seed in range(40)])
+
+
+@pytest.fixture
+def cell_trajectories():
+    return [TrajectoryUtil.point_to_cell(random_walk(120, 900 + seed)) for seed in range(6)]
+
+
+def test_parallel_detection_accuracy_matches_serial(cell_trajectories, correlation):
+    attacks = [
+        (Attack.random_distortion_attack, {"attack_ratio": 0.9}),
+        (Attack.correlation_attack, {"attack_ratio": 0.9}),
+        (Attack.majority_collusion_attack, {"collusion_count": 3}),
+    ]
+    args = (cell_trajectories, 4, 10, 2, 8, 60, 0.2, attacks, correlation)
+
+    serial = Evaluation.evaluate_detection_accuracy_multi(*args, seed=3)
+    parallel = Evaluation.evaluate_detection_accuracy_multi(*args, seed=3, parallel=True, n_jobs=2)
+
+    assert parallel == serial
+    assert Evaluation.evaluate_detection_accuracy_multi(*args, seed=3) == serial
+
+
+def test_concurrent_utility_metrics_match_serial(cell_trajectories, correlation):
+    metrics = [
+        EvaluationMetric.QA_POINTS,
+        EvaluationMetric.QA_PATTERNS,
+        EvaluationMetric.AREA_POPULARITY,
+        EvaluationMetric.TRIP_ERROR,
+        EvaluationMetric.DIAMETER_ERROR,
+    ]
+    args = (cell_trajectories, cell_trajectories, metrics, 0.2, 0.2, 0.1, correlation)
+
+    np.random.seed(5)
+    serial = Evaluation.evaluate_utility_multi(*args, n_jobs=1)
+    np.random.seed(5)
+    concurrent = Evaluation.evaluate_utility_multi(*args)
+
+    assert concurrent == serial
+    for metric in metrics[2:]:
+        np.random.seed(5)
+        assert Evaluation.evaluate_utility(*args[:2], metric, *args[3:]) == serial[metric]
@@ -0,0 +1,68 @@
+import json
+import numpy as np
+from conftest import random_walk
+from fingerprinting import Fingerprinting
+from correlation import Correlation
+from trajectory_store import TrajectoryStore
+from trajectory_store_writer import TrajectoryStoreWriter
+from trajectory_util import TrajectoryUtil
+
+
+def load_json(path):
+    with open(path, "r") as f:
+        return [[tuple(point) for point in trajectory] for trajectory in json.load(f)]
+
+
+def test_json_round_trip_of_points(tmp_path):
+    trajectories = [random_walk(length, seed) for seed, length in enumerate([20, 0, 1, 35])]
+    json_path = tmp_path / "extracted_trajectories.dat"
+    with json_path.open("w") as f:
+        json.dump(trajectories, f)
+
+    store = TrajectoryStore.from_json(json_path)
+
+    assert store.coordinates.dtype == np.float64
+    assert store.times.dtype == np.int64
+    assert store.to_list() == load_json(json_path)
+
+
+def test_json_round_trip_keeps_integer_cells_next_to_fractional_times(tmp_path):
+    trajectories = [
+        [(x, y, t + 0.25) for x, y, t in TrajectoryUtil.point_to_cell(random_walk(30, seed))] for seed in range(4)
+    ]
+    json_path = tmp_path / "exp_trajectories_0.dat"
+    with json_path.open("w") as f:
+        json.dump(trajectories, f)
+
+    store = TrajectoryStore.from_json(json_path)
+
+    assert store.coordinates.dtype == np.int64
+    assert store.times.dtype == np.float64
+    assert store.to_list() == load_json(json_path)
+    assert all(type(x) is int and type(y) is int for trajectory in store for x, y, _ in trajectory)
+
+
+def test_writer_matches_from_trajectories(tmp_path):
+    trajectories = [random_walk(length, seed) for seed, length in enumerate([50, 3, 0, 80, 1])]
+
+    # A limit of a few points forces several flushes.
+    with TrajectoryStoreWriter(tmp_path / "written.store", time_dtype=np.int64, memory_limit=256) as writer:
+        writer.write_many(trajectories)
+    written = TrajectoryStore.load(tmp_path / "written.store")
+
+    assert written.to_list() == TrajectoryStore.from_trajectories(trajectories).to_list() == trajectories
+    assert written[1:4].to_list() == trajectories[1:4]
+
+
+def test_fingerprinting_a_store_trajectory_matches_the_json_trajectory(tmp_path):
+    correlation = Correlation([[(x, y) for x, y, _ in random_walk(200, seed)] for seed in range(20)])
+    cells = [TrajectoryUtil.point_to_cell(random_walk(60, 100 + seed)) for seed in range(3)]
+    json_path = tmp_path / "exp_trajectories_0.dat"
+    with json_path.open("w") as f:
+        json.dump(cells, f)
+    store = TrajectoryStore.from_json(json_path)
+
+    for json_trajectory, store_trajectory in zip(load_json(json_path), store):
+        expected = Fingerprinting.probabilistic_fingerprint(json_trajectory, 0.2, 0.4, 0.1, correlation, rng=np.random.RandomState(7))
+        actual = Fingerprinting.probabilistic_fingerprint(store_trajectory, 0.2, 0.4, 0.1, correlation, rng=np.random.RandomState(7))
+        assert actual == expected
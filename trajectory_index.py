@@ -0,0 +1,52 @@
+import heapq
+import math
+
+
+class TrajectoryIndex:
+    """
+    An inverted cell index over released trajectories, used to find the likely sources of a leak.
+    """
+
+    def __init__(self, trajectories, trajectory_ids=None, max_postings=None):
+        """
+        Builds the posting lists of all released trajectories.
+
+        Args:
+            trajectories (list): The released trajectories as lists of tuples (x, y, time).
+            trajectory_ids (list, optional): The identifier of each trajectory. Defaults to the list positions.
+            max_postings (int, optional): Cells held by more trajectories than this are ignored at query time,
+                since they say little about the source. Defaults to None (keep all cells).
+        """
+        if trajectory_ids is None:
+            trajectory_ids = range(len(trajectories))
+        self.postings = {}
+        self.trajectory_count = 0
+        for trajectory_id, trajectory in zip(trajectory_ids, trajectories):
+            for cell in {(x_cell, y_cell) for x_cell, y_cell, _ in trajectory}:
+                self.postings.setdefault(cell, []).append(trajectory_id)
+            self.trajectory_count += 1
+        self.max_postings = max_postings
+
+    def query(self, leak_trajectory, top_k=3):
+        """
+        Finds the released trajectories that share the most informative cells with a leak.
+
+        Each distinct leaked cell adds its inverse document frequency to every trajectory in its posting list,
+        so the cost depends on the posting lists of the leaked cells rather than on the dataset size.
+
+        Args:
+            leak_trajectory (list): The leak trajectory as a list of tuples (x, y, _).
+            top_k (int, optional): The number of trajectories to return. Defaults to 3.
+
+        Returns:
+            list: Tuples (trajectory_id, score) sorted by descending score.
+        """
+        scores = {}
+        for cell in {(x_cell, y_cell) for x_cell, y_cell, _ in leak_trajectory}:
+            posting = self.postings.get(cell)
+            if not posting or (self.max_postings and len(posting) > self.max_postings):
+                continue
+            weight = math.log(1 + self.trajectory_count / len(posting))
+            for trajectory_id in posting:
+                scores[trajectory_id] = scores.get(trajectory_id, 0) + weight
+        return heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
@@ -0,0 +1,271 @@
+import json
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+import numpy as np
+
+
+class TrajectoryStore(Sequence):
+    """
+    A columnar ragged array of trajectories: contiguous coordinate and time columns and the offsets of each trajectory.
+
+    The coordinates and the times have their own dtypes, so integer grid cells stay integers next to fractional
+    timestamps. On disk a store is a directory holding `offsets.npy`, `coordinates.npy` and `times.npy`, which
+    are memory mapped on load.
+    """
+
+    OFFSETS_FILE = "offsets.npy"
+    COORDINATES_FILE = "coordinates.npy"
+    TIMES_FILE = "times.npy"
+
+    def __init__(self, offsets, coordinates, times):
+        """
+        Wraps existing offset, coordinate and time arrays without copying them.
+
+        Args:
+            offsets (numpy.ndarray): The (trajectories + 1) start offsets of the trajectories, ending with the point count.
+            coordinates (numpy.ndarray): The (points, 2) array of (x, y) rows.
+            times (numpy.ndarray): The (points,) array of timestamps.
+        """
+        self.offsets = offsets
+        self.coordinates = coordinates
+        self.times = times
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            stop = max(start, stop)
+            offsets = self.offsets[start : stop + 1]
+            return TrajectoryStore(
+                offsets - offsets[0],
+                self.coordinates[offsets[0] : offsets[-1]],
+                self.times[offsets[0] : offsets[-1]],
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Trajectory index out of range.")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return [(x, y, t) for (x, y), t in zip(self.coordinates[start:end].tolist(), self.times[start:end].tolist())]
+
+    def get_points(self, index):
+        """
+        Returns the points of a trajectory as one float array.
+
+        Args:
+            index (int): The index of the trajectory.
+
+        Returns:
+            numpy.ndarray: The (length, 3) array of (x, y, time) rows.
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return np.column_stack([self.coordinates[start:end], self.times[start:end]]).astype(float)
+
+    def get_lengths(self):
+        """
+        Returns the number of points of every trajectory.
+
+        Returns:
+            numpy.ndarray: The length of each trajectory.
+        """
+        return np.diff(self.offsets)
+
+    def to_list(self):
+        """
+        Materializes the store as a list of trajectories, as loaded from a JSON file.
+
+        Returns:
+            list: The trajectories as lists of tuples (x, y, time).
+        """
+        return list(self)
+
+    @staticmethod
+    def split_columns(trajectory, coordinate_dtype=None, time_dtype=None):
+        """
+        Splits a trajectory into its coordinate and time columns, inferring the dtype of each column separately.
+
+        Args:
+            trajectory (list or numpy.ndarray): The trajectory as a list of tuples (x, y, time) or a (length, 3) array.
+            coordinate_dtype (numpy.dtype, optional): The coordinate dtype. Defaults to the dtype of the coordinates.
+            time_dtype (numpy.dtype, optional): The time dtype. Defaults to the dtype of the timestamps.
+
+        Returns:
+            tuple: The (length, 2) coordinates and the (length,) times.
+        """
+        if isinstance(trajectory, np.ndarray):
+            trajectory = trajectory.reshape(-1, 3)
+            return (
+                trajectory[:, :2].astype(coordinate_dtype or trajectory.dtype),
+                trajectory[:, 2].astype(time_dtype or trajectory.dtype),
+            )
+        coordinates = np.asarray([point[:2] for point in trajectory], dtype=coordinate_dtype).reshape(-1, 2)
+        times = np.asarray([point[2] for point in trajectory], dtype=time_dtype)
+        return coordinates, times
+
+    @staticmethod
+    def from_trajectories(trajectories, coordinate_dtype=None, time_dtype=None):
+        """
+        Packs a list of trajectories into a store.
+
+        Args:
+            trajectories (iterable): The trajectories as lists of tuples (x, y, time) or (length, 3) arrays.
+            coordinate_dtype (numpy.dtype, optional): The coordinate dtype. Defaults to int64 if all coordinates are
+                integers, float64 otherwise.
+            time_dtype (numpy.dtype, optional): The time dtype. Defaults to int64 if all timestamps are integers,
+                float64 otherwise.
+
+        Returns:
+            TrajectoryStore: The packed trajectories.
+        """
+        columns = [TrajectoryStore.split_columns(trajectory, coordinate_dtype, time_dtype) for trajectory in trajectories]
+        offsets = np.zeros(len(columns) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(times) for _, times in columns])
+
+        # Empty trajectories parse as float arrays and must not decide the dtype of integer cell data.
+        columns = [(coordinates, times) for coordinates, times in columns if len(times)]
+        if coordinate_dtype is None:
+            coordinate_dtype = np.result_type(*[coordinates for coordinates, _ in columns]) if columns else np.float64
+        if time_dtype is None:
+            time_dtype = np.result_type(*[times for _, times in columns]) if columns else np.float64
+        if not columns:
+            return TrajectoryStore(offsets, np.empty((0, 2), dtype=coordinate_dtype), np.empty(0, dtype=time_dtype))
+        return TrajectoryStore(
+            offsets,
+            np.concatenate([coordinates for coordinates, _ in columns], dtype=coordinate_dtype),
+            np.concatenate([times for _, times in columns], dtype=time_dtype),
+        )
+
+    def save(self, path):
+        """
+        Saves the store to a directory, replacing any existing store only once it is completely written.
+
+        Args:
+            path (str or Path): The store directory.
+        """
+        temp_path = TrajectoryStore.get_temp_path(path)
+        try:
+            np.save(temp_path / TrajectoryStore.COORDINATES_FILE, np.ascontiguousarray(self.coordinates))
+            np.save(temp_path / TrajectoryStore.TIMES_FILE, np.ascontiguousarray(self.times))
+            np.save(temp_path / TrajectoryStore.OFFSETS_FILE, np.ascontiguousarray(self.offsets))
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        TrajectoryStore.move_into_place(temp_path, path)
+
+    @staticmethod
+    def get_temp_path(path):
+        """
+        Creates an empty directory next to a store directory, to write a new version of the store into.
+
+        Args:
+            path (str or Path): The store directory.
+
+        Returns:
+            Path: The temporary directory.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name("{}.tmp-{}".format(path.name, os.getpid()))
+        shutil.rmtree(temp_path, ignore_errors=True)
+        temp_path.mkdir()
+        return temp_path
+
+    @staticmethod
+    def move_into_place(temp_path, path):
+        """
+        Replaces a store directory with a completely written temporary one.
+
+        The files of the old store are unlinked rather than overwritten, so stores that are already memory mapped
+        keep reading the old data.
+
+        Args:
+            temp_path (Path): The temporary directory, from `get_temp_path`.
+            path (str or Path): The store directory.
+        """
+        path = Path(path)
+        old_path = path.with_name("{}.old-{}".format(path.name, os.getpid()))
+        if path.exists():
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """
+        Loads a store saved with `save`.
+
+        Args:
+            path (str or Path): The store directory.
+            mmap_mode (str, optional): The numpy memory-map mode, or None to read the arrays into memory. Defaults to "r".
+
+        Returns:
+            TrajectoryStore: The loaded store.
+        """
+        path = Path(path)
+        return TrajectoryStore(
+            np.load(path / TrajectoryStore.OFFSETS_FILE, mmap_mode=mmap_mode),
+            np.load(path / TrajectoryStore.COORDINATES_FILE, mmap_mode=mmap_mode),
+            np.load(path / TrajectoryStore.TIMES_FILE, mmap_mode=mmap_mode),
+        )
+
+    @staticmethod
+    def get_store_path(json_path):
+        """
+        Returns the store directory that replaces a JSON trajectory file.
+
+        Args:
+            json_path (str or Path): The path of the JSON file, e.g. `exp_trajectories_0.dat`.
+
+        Returns:
+            Path: The store directory, e.g. `exp_trajectories_0.store`.
+        """
+        return Path(json_path).with_suffix(".store")
+
+    @staticmethod
+    def from_json(json_path, store_path=None):
+        """
+        Converts a JSON trajectory file to a store, inferring the coordinate and time dtypes from the data.
+
+        Args:
+            json_path (str or Path): The path of the JSON file.
+            store_path (str or Path, optional): The store directory. Defaults to `get_store_path(json_path)`.
+
+        Returns:
+            TrajectoryStore: The memory-mapped converted store.
+        """
+        if store_path is None:
+            store_path = TrajectoryStore.get_store_path(json_path)
+        with Path(json_path).open("r") as f:
+            TrajectoryStore.from_trajectories(json.load(f)).save(store_path)
+        return TrajectoryStore.load(store_path)
+
+    def to_json(self, json_path):
+        """
+        Writes the store as a JSON trajectory file.
+
+        Args:
+            json_path (str or Path): The path of the JSON file.
+        """
+        with Path(json_path).open("w") as f:
+            json.dump(self.to_list(), f)
+
+    def sample(self, count, rng=None):
+        """
+        Draws distinct trajectories at random, reading only the sampled ones.
+
+        Args:
+            count (int): The number of trajectories to draw.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            list: The sampled trajectories as lists of tuples (x, y, time).
+        """
+        rng = np.random if rng is None else rng
+        return [self[int(index)] for index in rng.choice(len(self), count, replace=False)]
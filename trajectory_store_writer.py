@@ -0,0 +1,143 @@
+import shutil
+from pathlib import Path
+import numpy as np
+from trajectory_store import TrajectoryStore
+
+
+class TrajectoryStoreWriter:
+    """
+    Writes a trajectory store incrementally, holding at most a bounded buffer of points in memory.
+
+    Points are appended to the coordinate and time files as they are flushed and their headers are rewritten with
+    the final shapes on `close`, so the store is never materialized as a whole. The store is written to a temporary directory
+    that replaces the target directory only when the writer is closed without error.
+    """
+
+    HEADER_SIZE = 128
+    # Size of the .npy header, which fits any (points, 2) or (points,) shape.
+
+    def __init__(self, path, coordinate_dtype=np.float64, time_dtype=np.float64, memory_limit=256 * 1024 ** 2):
+        """
+        Creates an empty store.
+
+        Args:
+            path (str or Path): The store directory.
+            coordinate_dtype (numpy.dtype, optional): The coordinate dtype, e.g. int64 for grid cells. Defaults to float64.
+            time_dtype (numpy.dtype, optional): The time dtype. Defaults to float64.
+            memory_limit (int, optional): The number of bytes of points buffered before flushing to disk. Defaults to 256 MiB.
+        """
+        self.path = Path(path)
+        self.temp_path = TrajectoryStore.get_temp_path(self.path)
+        self.coordinate_dtype = np.dtype(coordinate_dtype)
+        self.time_dtype = np.dtype(time_dtype)
+        self.buffer_limit = max(1, memory_limit // (2 * self.coordinate_dtype.itemsize + self.time_dtype.itemsize))
+        self.coordinate_buffer = []
+        self.time_buffer = []
+        self.buffered_points = 0
+        self.point_count = 0
+        self.lengths = []
+
+        self.coordinates_file = (self.temp_path / TrajectoryStore.COORDINATES_FILE).open("wb")
+        self.times_file = (self.temp_path / TrajectoryStore.TIMES_FILE).open("wb")
+        self.write_headers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_headers(self):
+        """
+        Writes the .npy headers of the coordinate and time files for the points flushed so far.
+        """
+        for column_file, dtype, shape in (
+            (self.coordinates_file, self.coordinate_dtype, (self.point_count, 2)),
+            (self.times_file, self.time_dtype, (self.point_count,)),
+        ):
+            header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape}
+            column_file.seek(0)
+            np.lib.format.write_array_header_1_0(column_file, header)
+            assert column_file.tell() == TrajectoryStoreWriter.HEADER_SIZE
+            column_file.seek(0, 2)
+
+    def write(self, trajectory):
+        """
+        Appends a trajectory to the store.
+
+        Args:
+            trajectory (list or numpy.ndarray): The trajectory as a list of tuples (x, y, time) or a (length, 3) array.
+        """
+        self.write_columns(*TrajectoryStore.split_columns(trajectory, self.coordinate_dtype, self.time_dtype))
+
+    def write_columns(self, coordinates, times):
+        """
+        Appends a trajectory given as separate coordinate and time columns.
+
+        Args:
+            coordinates (numpy.ndarray): The (length, 2) coordinates of the trajectory.
+            times (numpy.ndarray): The (length,) timestamps of the trajectory.
+        """
+        self.coordinate_buffer.append(np.asarray(coordinates, dtype=self.coordinate_dtype).reshape(-1, 2))
+        self.time_buffer.append(np.asarray(times, dtype=self.time_dtype).reshape(-1))
+        self.buffered_points += len(times)
+        self.lengths.append(len(times))
+        if self.buffered_points >= self.buffer_limit:
+            self.flush()
+
+    def write_many(self, trajectories):
+        """
+        Appends several trajectories to the store, in order.
+
+        Args:
+            trajectories (iterable): The trajectories as lists of tuples (x, y, time).
+        """
+        for trajectory in trajectories:
+            self.write(trajectory)
+
+    def flush(self):
+        """
+        Writes the buffered points to disk.
+        """
+        if self.coordinate_buffer:
+            np.concatenate(self.coordinate_buffer).tofile(self.coordinates_file)
+            np.concatenate(self.time_buffer).tofile(self.times_file)
+            self.point_count += self.buffered_points
+            self.coordinate_buffer = []
+            self.time_buffer = []
+            self.buffered_points = 0
+
+    def close(self):
+        """
+        Flushes the remaining points and finalizes the store.
+
+        Returns:
+            TrajectoryStore: The memory-mapped written store.
+        """
+        if self.times_file.closed:
+            return TrajectoryStore.load(self.path)
+        try:
+            self.flush()
+            self.write_headers()
+            self.coordinates_file.close()
+            self.times_file.close()
+
+            offsets = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(self.lengths)
+            np.save(self.temp_path / TrajectoryStore.OFFSETS_FILE, offsets)
+        except BaseException:
+            self.abort()
+            raise
+        TrajectoryStore.move_into_place(self.temp_path, self.path)
+        return TrajectoryStore.load(self.path)
+
+    def abort(self):
+        """
+        Discards the written points, leaving any existing store at the target directory untouched.
+        """
+        self.coordinates_file.close()
+        self.times_file.close()
+        shutil.rmtree(self.temp_path, ignore_errors=True)
@@ -0,0 +1,100 @@
+import os
+from collections.abc import Sequence
+from pathlib import Path
+import numpy as np
+
+
+class TrajectorySubset(Sequence):
+    """
+    A subset of the trajectories of a shared base store, given by their indexes.
+
+    On disk a subset is a `.split.npz` file holding the indexes and the name of the base store, so that several
+    dataset splits share one copy of the trajectories.
+    """
+
+    def __init__(self, store, indexes):
+        """
+        Selects trajectories of a store without copying them.
+
+        Args:
+            store (TrajectoryStore): The base store.
+            indexes (numpy.ndarray): The indexes of the selected trajectories in the base store.
+        """
+        self.store = store
+        self.indexes = np.asarray(indexes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TrajectorySubset(self.store, self.indexes[index])
+        return self.store[int(self.indexes[index])]
+
+    def to_list(self):
+        """
+        Materializes the subset as a list of trajectories, as loaded from a JSON file.
+
+        Returns:
+            list: The trajectories as lists of tuples (x, y, time).
+        """
+        return list(self)
+
+    def sample(self, count, rng=None):
+        """
+        Draws distinct trajectories of the subset at random, reading only the sampled ones.
+
+        Args:
+            count (int): The number of trajectories to draw.
+            rng (RandomState, optional): The random generator. Defaults to the global numpy generator.
+
+        Returns:
+            list: The sampled trajectories as lists of tuples (x, y, time).
+        """
+        rng = np.random if rng is None else rng
+        return [self[int(index)] for index in rng.choice(len(self), count, replace=False)]
+
+    @staticmethod
+    def get_split_path(json_path):
+        """
+        Returns the split file that replaces a JSON trajectory file.
+
+        Args:
+            json_path (str or Path): The path of the JSON file, e.g. `exp_trajectories_0.dat`.
+
+        Returns:
+            Path: The split file, e.g. `exp_trajectories_0.split.npz`.
+        """
+        return Path(json_path).with_suffix(".split.npz")
+
+    @staticmethod
+    def save(path, indexes, base_path):
+        """
+        Saves the indexes of a subset and the location of its base store.
+
+        Args:
+            path (str or Path): The split file.
+            indexes (numpy.ndarray): The indexes of the selected trajectories.
+            base_path (str or Path): The base store directory, stored relative to the split file.
+        """
+        path = Path(path)
+        base_name = Path(os.path.relpath(Path(base_path).resolve(), path.parent.resolve())).as_posix()
+        with path.open("wb") as f:
+            np.savez(f, indexes=np.asarray(indexes, dtype=np.int64), base=np.array(base_name))
+
+    @staticmethod
+    def read(path):
+        """
+        Reads a split file saved with `save`.
+
+        Args:
+            path (str or Path): The split file.
+
+        Returns:
+            tuple: The indexes of the selected trajectories and the path of the base store.
+        """
+        path = Path(path)
+        with np.load(path) as data:
+            indexes = data["indexes"]
+            indexes.flags.writeable = False
+            return indexes, path.parent / str(data["base"])
@@ -2,6 +2,7 @@ from imports import *
 from configuration import *
 from distance import *
 from coordinates import *
+from trajectory_store_writer import *
 
 
 class TrajectoryUtil:
@@ -135,6 +136,87 @@ class TrajectoryUtil:
 
         return new_trajectory
 
+    @staticmethod
+    def resample_points(points, interval=None):
+        """
+        Resamples an array of trajectory points to a fixed time interval with linear interpolation.
+
+        Args:
+            points (numpy.ndarray): Trajectory points of shape (n, 3), in increasing time order.
+            interval (float): Time interval between points.
+
+        Returns:
+            numpy.ndarray: Resampled points of shape (m, 3), with times relative to the first point.
+        """
+        if not interval:
+            interval = Configuration.TARGET_INTERVAL
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0:
+            return points
+
+        times = points[:, 2] - points[0, 2]
+        # Of several points sharing a timestamp, the last one starts the next segment.
+        keep = np.r_[times[1:] != times[:-1], True]
+        new_times = np.arange(int(times[-1] // interval) + 1) * interval
+
+        resampled = np.empty((len(new_times), 3))
+        resampled[:, 0] = np.interp(new_times, times[keep], points[keep, 0])
+        resampled[:, 1] = np.interp(new_times, times[keep], points[keep, 1])
+        resampled[:, 2] = new_times
+        resampled[0, :2] = points[0, :2]
+        return resampled
+
+    @staticmethod
+    def resample_trajectory(trajectory, interval=None):
+        """
+        Smoothes a trajectory like `smooth_trajectory`, interpolating all resampled points at once.
+
+        Args:
+            trajectory (list): Trajectory data.
+            interval (float): Time interval between points.
+
+        Returns:
+            list: Smoothed trajectory data.
+        """
+        if not interval:
+            interval = Configuration.TARGET_INTERVAL
+        resampled = TrajectoryUtil.resample_points(trajectory, interval)
+        new_times = np.arange(len(resampled)) * interval
+        return list(zip(resampled[:, 0].tolist(), resampled[:, 1].tolist(), new_times.tolist()))
+
+    @staticmethod
+    def resample_store(store, interval=None, out_path=None, chunk_size=1000, n_jobs=16):
+        """
+        Resamples every trajectory of a trajectory store, in parallel chunks of trajectories.
+
+        Args:
+            store (TrajectoryStore): The trajectories to resample.
+            interval (float): Time interval between points.
+            out_path (str or Path, optional): The directory of the resampled store. Defaults to None (keep it in memory).
+            chunk_size (int): The number of trajectories per job (default: 1000).
+            n_jobs (int): The number of parallel jobs (default: 16).
+
+        Returns:
+            TrajectoryStore: The resampled trajectories.
+        """
+        if not interval:
+            interval = Configuration.TARGET_INTERVAL
+
+        def resample_chunk(chunk):
+            return [
+                TrajectoryUtil.resample_points(chunk.get_points(index), interval) for index in range(len(chunk))
+            ]
+
+        chunks = Parallel(n_jobs=n_jobs)(
+            delayed(resample_chunk)(store[start : start + chunk_size]) for start in range(0, len(store), chunk_size)
+        )
+        trajectories = (trajectory for chunk in chunks for trajectory in chunk)
+        if out_path is None:
+            return TrajectoryStore.from_trajectories(trajectories, coordinate_dtype=float, time_dtype=float)
+        with TrajectoryStoreWriter(out_path) as writer:
+            writer.write_many(trajectories)
+        return TrajectoryStore.load(out_path)
+
     @staticmethod
     def point_to_cell(trajectory):
         """
@@ -206,6 +288,50 @@ class TrajectoryUtil:
             length += Distance.sq_euclidean(prev_point, curr_point)
         return length
 
+    @staticmethod
+    def calc_trajectory_diameter(trajectory):
+        """
+        Calculates the diameter of a trajectory, the largest distance between two of its points.
+
+        The farthest pair lies on the convex hull, which is scanned with rotating calipers.
+
+        Args:
+            trajectory (list or numpy.ndarray): Trajectory data.
+
+        Returns:
+            float: Trajectory diameter.
+        """
+        if len(trajectory) < 2:
+            return 0.0
+        points = np.unique(np.asarray(trajectory, dtype=float).reshape(len(trajectory), -1)[:, :2], axis=0)
+        if len(points) < 2:
+            return 0.0
+
+        try:
+            vertices = points[ConvexHull(points).vertices]
+        except QhullError:
+            # Collinear points: the lexicographic extremes are the end points of the segment
+            return Distance.euclidean(points[0], points[-1])
+
+        def cross(origin, point_1, point_2):
+            return (point_1[0] - origin[0]) * (point_2[1] - origin[1]) - (point_1[1] - origin[1]) * (point_2[0] - origin[0])
+
+        vertex_count = len(vertices)
+        max_sq_distance = 0
+        j = 1
+        for i in range(vertex_count):
+            next_i = (i + 1) % vertex_count
+            while cross(vertices[i], vertices[next_i], vertices[(j + 1) % vertex_count]) > cross(
+                vertices[i], vertices[next_i], vertices[j]
+            ):
+                j = (j + 1) % vertex_count
+            max_sq_distance = max(
+                max_sq_distance,
+                Distance.sq_euclidean(vertices[i], vertices[j]),
+                Distance.sq_euclidean(vertices[next_i], vertices[j]),
+            )
+        return math.sqrt(max_sq_distance)
+
     @staticmethod
     def add_time(trajectory):
         """
@@ -0,0 +1,194 @@
+import numpy as np
+from configuration import Configuration
+from trajectory_util import TrajectoryUtil
+
+
+class UtilityIndex:
+    """
+    A dataset projected once onto the evaluation grid, with the tables shared by the utility metrics.
+    """
+
+    def __init__(self, dataset, grid_size=Configuration.EVAL_GRID_SIZE):
+        """
+        Projects a dataset onto the evaluation grid.
+
+        Args:
+            dataset (list): The trajectories as lists of tuples (x_cell, y_cell, time).
+            grid_size (int, optional): The size of the evaluation grid. Defaults to Configuration.EVAL_GRID_SIZE.
+        """
+        self.grid_size = grid_size
+        self.offsets = np.r_[0, np.cumsum([len(trajectory) for trajectory in dataset])].astype(np.int64)
+        self.cells = np.array(
+            [(x_cell, y_cell) for trajectory in dataset for x_cell, y_cell, _ in trajectory], dtype=float
+        ).reshape(-1, 2)
+
+        projected = np.clip(
+            (self.cells / Configuration.GRID_SIZE * grid_size).astype(np.int64), 0, grid_size - 1
+        )
+        self.cell_ids = projected[:, 0] * grid_size + projected[:, 1]
+        self._prefix_sum = None
+        self._pattern_counts = {}
+        self._diameters = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def of(dataset, grid_size=Configuration.EVAL_GRID_SIZE):
+        """
+        Returns the utility index of a dataset, reusing it if the dataset is already an index of the same grid size.
+
+        Args:
+            dataset (list or UtilityIndex): The trajectories, or an existing index.
+            grid_size (int, optional): The size of the evaluation grid. Defaults to Configuration.EVAL_GRID_SIZE.
+
+        Returns:
+            UtilityIndex: The index of the dataset.
+        """
+        if isinstance(dataset, UtilityIndex) and dataset.grid_size == grid_size:
+            return dataset
+        return UtilityIndex(dataset, grid_size)
+
+    def get_prefix_sum(self):
+        """
+        Rasterizes the points into a density grid and builds its summed-area table.
+
+        Returns:
+            numpy.ndarray: The (grid_size + 1, grid_size + 1) table whose entry [x, y] counts the points in cells [0, x) x [0, y).
+        """
+        if self._prefix_sum is None:
+            density = np.bincount(self.cell_ids, minlength=self.grid_size ** 2).reshape(self.grid_size, self.grid_size)
+            prefix_sum = np.zeros((self.grid_size + 1, self.grid_size + 1), dtype=np.int64)
+            prefix_sum[1:, 1:] = density.cumsum(axis=0).cumsum(axis=1)
+            self._prefix_sum = prefix_sum
+        return self._prefix_sum
+
+    def range_counts(self, x_lows, y_lows, x_highs, y_highs):
+        """
+        Counts the points inside rectangular areas of the evaluation grid, all bounds inclusive.
+
+        Args:
+            x_lows (numpy.ndarray): The lower x bounds of the areas.
+            y_lows (numpy.ndarray): The lower y bounds of the areas.
+            x_highs (numpy.ndarray): The upper x bounds of the areas.
+            y_highs (numpy.ndarray): The upper y bounds of the areas.
+
+        Returns:
+            numpy.ndarray: The number of points in each area.
+        """
+        prefix_sum = self.get_prefix_sum()
+        return (
+            prefix_sum[x_highs + 1, y_highs + 1]
+            - prefix_sum[x_lows, y_highs + 1]
+            - prefix_sum[x_highs + 1, y_lows]
+            + prefix_sum[x_lows, y_lows]
+        )
+
+    def get_visit_histogram(self):
+        """
+        Counts the visits of every cell of the evaluation grid.
+
+        Returns:
+            numpy.ndarray: The visit count of each flat cell id.
+        """
+        return np.bincount(self.cell_ids, minlength=self.grid_size ** 2)
+
+    def get_trip_histogram(self):
+        """
+        Counts the trips between every pair of start and end cells of the evaluation grid.
+
+        Returns:
+            numpy.ndarray: The trip count of each flat (start cell, end cell) id.
+        """
+        lengths = np.diff(self.offsets)
+        start_ids = self.cell_ids[self.offsets[:-1][lengths > 0]]
+        end_ids = self.cell_ids[self.offsets[1:][lengths > 0] - 1]
+        return np.bincount(start_ids * self.grid_size ** 2 + end_ids, minlength=self.grid_size ** 4)
+
+    def get_diameters(self):
+        """
+        Calculates the diameter of every trajectory, in cells of the original grid.
+
+        The points of all trajectories are first reduced in one batch to the leftmost and rightmost point of each
+        row (same y) of each trajectory, which keeps every convex hull vertex. The hull and rotating calipers are
+        sequential per point set, so they still run once per trajectory, on the reduced points.
+
+        Returns:
+            numpy.ndarray: The diameter of each trajectory.
+        """
+        if self._diameters is None:
+            trajectory_ids = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+            order = np.lexsort((self.cells[:, 0], self.cells[:, 1], trajectory_ids))
+            sorted_ids = trajectory_ids[order]
+            sorted_y = self.cells[order, 1]
+
+            row_starts = np.r_[True, (sorted_ids[1:] != sorted_ids[:-1]) | (sorted_y[1:] != sorted_y[:-1])]
+            row_ends = np.r_[row_starts[1:], True]
+            extremes = order[row_starts | row_ends]
+            extreme_offsets = np.r_[0, np.cumsum(np.bincount(trajectory_ids[extremes], minlength=len(self)))]
+
+            self._diameters = np.array(
+                [
+                    TrajectoryUtil.calc_trajectory_diameter(self.cells[extremes[start:end]])
+                    for start, end in zip(extreme_offsets[:-1], extreme_offsets[1:])
+                ]
+            )
+        return self._diameters
+
+    def hash_patterns(self, patterns):
+        """
+        Hashes cell-id patterns with the polynomial hash used by the pattern index.
+
+        The hash is exact while grid_size ** (2 * pattern_length) fits in 64 bits and wraps around otherwise.
+
+        Args:
+            patterns (numpy.ndarray): The patterns as an array of flat cell ids of shape (patterns, pattern_length).
+
+        Returns:
+            numpy.ndarray: The uint64 hash of each pattern.
+        """
+        base = np.uint64(self.grid_size ** 2)
+        hashes = np.zeros(len(patterns), dtype=np.uint64)
+        for column in np.asarray(patterns, dtype=np.uint64).T:
+            hashes = hashes * base + column
+        return hashes
+
+    def get_pattern_counts(self, pattern_length):
+        """
+        Builds, in one pass over the dataset, the count table of all cell patterns of a given length.
+
+        Args:
+            pattern_length (int): The number of cells per pattern.
+
+        Returns:
+            tuple: The window hashes in dataset order, and the sorted distinct hashes with their counts.
+        """
+        if pattern_length not in self._pattern_counts:
+            point_count = len(self.cell_ids)
+            lengths = np.diff(self.offsets)
+            trajectory_ends = np.repeat(self.offsets[1:], lengths)
+            starts = np.flatnonzero(np.arange(point_count) + pattern_length <= trajectory_ends)
+
+            windows = self.cell_ids[starts[:, None] + np.arange(pattern_length)]
+            window_hashes = self.hash_patterns(windows)
+            pattern_hashes, pattern_counts = np.unique(window_hashes, return_counts=True)
+            self._pattern_counts[pattern_length] = (window_hashes, pattern_hashes, pattern_counts)
+        window_hashes, pattern_hashes, pattern_counts = self._pattern_counts[pattern_length]
+        return window_hashes, (pattern_hashes, pattern_counts)
+
+    def count_patterns(self, pattern_hashes, pattern_length):
+        """
+        Looks up how often each hashed pattern occurs in the dataset.
+
+        Args:
+            pattern_hashes (numpy.ndarray): The hashes of the queried patterns.
+            pattern_length (int): The number of cells per pattern.
+
+        Returns:
+            numpy.ndarray: The number of occurrences of each pattern.
+        """
+        _, (known_hashes, known_counts) = self.get_pattern_counts(pattern_length)
+        if len(known_hashes) == 0:
+            return np.zeros(len(pattern_hashes), dtype=np.int64)
+        positions = np.minimum(np.searchsorted(known_hashes, pattern_hashes), len(known_hashes) - 1)
+        return np.where(known_hashes[positions] == pattern_hashes, known_counts[positions], 0)